@@ -0,0 +1,83 @@
+import queue
+import threading
+import time
+
+import frappe
+
+
+# ─────────────────────────────────────────────────────
+# Rate limiting
+# ─────────────────────────────────────────────────────
+class RateLimiter:
+    """Thread-safe token bucket: at most `rate` acquisitions per second (bursts up to `burst`)."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+# ─────────────────────────────────────────────────────
+# Concurrent EFRIS calls inside a site context
+# ─────────────────────────────────────────────────────
+def run_concurrently(fn, items, max_workers=4, rate_per_sec=None):
+    """
+    Call fn(item) for every item on `max_workers` threads, each with its own
+    site connection (make_post needs frappe.db for settings and request logs).
+    Returns a list of (item, result, exception) in input order.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    site = frappe.local.site
+    user = frappe.session.user
+    lane = getattr(frappe.local, "efris_lane", None)  # keep the caller's EFRIS dispatch lane
+    limiter = RateLimiter(rate_per_sec) if rate_per_sec else None
+    results = [None] * len(items)
+    work = queue.Queue()
+    for index, item in enumerate(items):
+        work.put((index, item))
+
+    def worker():
+        frappe.init(site=site)
+        frappe.connect()
+        frappe.set_user(user)
+        frappe.local.efris_lane = lane
+        try:
+            while True:
+                try:
+                    index, item = work.get_nowait()
+                except queue.Empty:
+                    break
+                if limiter:
+                    limiter.acquire()
+                try:
+                    results[index] = (item, fn(item), None)
+                    frappe.db.commit()
+                except Exception as e:
+                    frappe.db.rollback()
+                    results[index] = (item, None, e)
+        finally:
+            frappe.destroy()
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(min(max_workers, len(items)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results
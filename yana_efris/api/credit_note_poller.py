@@ -0,0 +1,176 @@
+from collections import defaultdict
+
+import frappe
+from frappe.utils import add_days, cint, getdate, today
+
+from yana_efris.api.concurrency import run_concurrently
+from yana_efris.api.dispatch import bulk_lane, efris_post
+from yana_efris.api.goods_registration import _first_column
+
+# ─────────────────────────────────────────────────────
+# Config (site_config.json)
+#   efris_credit_note_poll_rate:    EFRIS calls per second across poller threads (default 2)
+#   efris_credit_note_poll_workers: concurrent threads (default 4)
+# ─────────────────────────────────────────────────────
+PENDING_STATUS = "EFRIS Credit Note Pending"
+DECIDED_STATUSES = {"101", "103", "104"}   # T111 approveStatus: approved / rejected / voided (102 = still submitted)
+T111_PAGE_SIZE = 99
+# E Invoice column holding the T110 application reference (referenceNo / id in T111), where the site has one
+APPLICATION_REF_COLUMNS = ("credit_note_application_ref_no", "credit_note_application_id", "application_reference_no")
+DEFAULT_RATE = 2
+DEFAULT_WORKERS = 4
+
+# ─────────────────────────────────────────────────────
+# Scheduler entry
+# ─────────────────────────────────────────────────────
+@bulk_lane()
+def poll_credit_note_approvals():
+    """Scheduler (every 5 minutes): resolve pending credit notes without anyone opening the forms."""
+    pending = get_pending_credit_notes()
+    if not pending:
+        return {}
+
+    by_company = defaultdict(list)
+    for row in pending:
+        by_company[row.company].append(row)
+
+    rate = float(frappe.conf.get("efris_credit_note_poll_rate") or DEFAULT_RATE)
+    workers = cint(frappe.conf.get("efris_credit_note_poll_workers")) or DEFAULT_WORKERS
+
+    # 1️⃣ one paged T111 list query per company (companies in parallel)
+    decided = []
+    for (company, rows), applications, error in run_concurrently(
+        lambda item: query_applications(item[0], item[1]), by_company.items(), max_workers=workers, rate_per_sec=rate
+    ):
+        if error is not None:
+            # list query unavailable - fall back to checking every pending note of this company
+            frappe.log_error(f"T111 query failed for {company}: {error}", "EFRIS CREDIT NOTE POLL")
+            decided.extend(rows)
+            continue
+        decided.extend(row for row in rows if is_decided(row, applications))
+
+    # 2️⃣ only decided notes go through uganda_compliance's confirm_irn_cancellation (status + FDN handling).
+    #    Deliberately one call per note rather than a bulk status write: it also fetches
+    #    the approved note's FDN / QR data, which the T111 list doesn't carry.
+    failed = 0
+    for row, _result, error in run_concurrently(confirm_credit_note, decided, max_workers=workers, rate_per_sec=rate):
+        if error is not None:
+            failed += 1
+            frappe.log_error(f"{row.sales_invoice}: {error}", "EFRIS CREDIT NOTE POLL")
+
+    # 3️⃣ one read-back query, then notify any open forms
+    statuses = dict(frappe.get_all(
+        "E Invoice", filters={"name": ["in", [row.name for row in decided] or [""]]}, fields=["name", "status"], as_list=True
+    ))
+    for row in decided:
+        status = statuses.get(row.name)
+        if status and status != PENDING_STATUS:
+            frappe.publish_realtime(
+                "efris_credit_note_status",
+                {"sales_invoice": row.sales_invoice, "e_invoice": row.name, "status": status},
+                doctype="Sales Invoice",
+                docname=row.sales_invoice,
+            )
+
+    summary = {"pending": len(pending), "decided": len(decided), "failed": failed}
+    if decided:
+        frappe.logger("yana_efris").info(f"EFRIS credit note poll: {summary}")
+    return summary
+
+@frappe.whitelist()
+def enqueue_credit_note_poll():
+    """Run the poller now (e.g. from a list view button) instead of waiting for the scheduler."""
+    frappe.only_for(["System Manager", "Accounts Manager"])
+    frappe.enqueue(
+        "yana_efris.api.credit_note_poller.poll_credit_note_approvals",
+        queue="long",
+        job_id="efris_credit_note_poll",
+        deduplicate=True,
+    )
+
+# ─────────────────────────────────────────────────────
+# Helpers
+# ─────────────────────────────────────────────────────
+def get_pending_credit_notes():
+    """All pending credit-note E Invoices with their company, original FDN and application reference - one query."""
+    application_ref = _first_column("E Invoice", APPLICATION_REF_COLUMNS)
+    return frappe.db.sql(
+        f"""
+        SELECT ei.name, ei.creation, si.name AS sales_invoice, si.company, orig.efris_irn AS original_fdn,
+               {f"ei.`{application_ref}`" if application_ref else "NULL"} AS application_ref
+        FROM `tabE Invoice` ei
+        JOIN `tabSales Invoice` si ON si.name = ei.invoice
+        LEFT JOIN `tabSales Invoice` orig ON orig.name = si.return_against
+        WHERE ei.status = %(status)s
+          AND si.is_return = 1
+        ORDER BY ei.creation
+        """,
+        {"status": PENDING_STATUS},
+        as_dict=True,
+    )
+
+def query_applications(company, rows):
+    """
+    T111 credit note applications since the oldest pending one:
+    {"by_reference": {referenceNo / id: record}, "by_original": {oriInvoiceNo: [records]}}.
+    """
+    start_date = add_days(getdate(min(row.creation for row in rows)), -1)
+    applications, page_no = {"by_reference": {}, "by_original": defaultdict(list)}, 1
+    while True:
+        success, response = efris_post(
+            interfaceCode="T111",
+            content={
+                "referenceNo": "",
+                "invoiceNo": "",
+                "oriInvoiceNo": "",
+                "approveStatus": "",
+                "invoiceApplyCategoryCode": "101",
+                "startDate": str(start_date),
+                "endDate": str(today()),
+                "queryType": "1",
+                "pageNo": str(page_no),
+                "pageSize": str(T111_PAGE_SIZE),
+            },
+            company_name=company,
+        )
+        if not success:
+            raise Exception(response)
+
+        if isinstance(response, dict) and isinstance(response.get("message"), dict):
+            msg = response["message"]
+        else:
+            msg = response or {}
+        records = msg.get("records") or []
+        for record in records:
+            for reference in (record.get("referenceNo"), record.get("id")):
+                if reference:
+                    applications["by_reference"][str(reference)] = record
+            # several credit notes can be raised against one invoice - keep them all
+            applications["by_original"][record.get("oriInvoiceNo")].append(record)
+
+        page_count = cint((msg.get("page") or {}).get("pageCount"))
+        if not records or len(records) < T111_PAGE_SIZE or (page_count and page_no >= page_count):
+            return applications
+        page_no += 1
+
+def is_decided(row, applications):
+    """
+    Whether URA has decided the note's own application. Without a stored application
+    reference, any decided application against the same original invoice sends the
+    note to confirm_irn_cancellation, which looks up its own application - an extra
+    call at worst, never a note stuck in pending.
+    """
+    if row.application_ref:
+        record = applications["by_reference"].get(str(row.application_ref))
+        if record:
+            return record.get("approveStatus") in DECIDED_STATUSES
+    return any(
+        record.get("approveStatus") in DECIDED_STATUSES
+        for record in applications["by_original"].get(row.original_fdn) or ()
+    )
+
+def confirm_credit_note(row):
+    """Same call the form's "Check EFRIS Approval Status" button makes."""
+    from uganda_compliance.efris.api_classes.e_invoice import confirm_irn_cancellation
+
+    return confirm_irn_cancellation(frappe.as_json(frappe.get_doc("Sales Invoice", row.sales_invoice).as_dict()))
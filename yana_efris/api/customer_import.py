@@ -0,0 +1,166 @@
+import csv
+import io
+import re
+
+import frappe
+from frappe.utils import cint
+
+from yana_efris.api.concurrency import run_concurrently
+from yana_efris.api.dispatch import bulk_lane
+from yana_efris.api.efris_api import get_taxpayer, new_customer_from_taxpayer
+from yana_efris.api.jobs import enqueue_report_job, get_report, store_report
+
+# ─────────────────────────────────────────────────────
+# Config (override in site_config.json)
+# ─────────────────────────────────────────────────────
+BATCH_SIZE = 100            # customers inserted per commit
+MAX_WORKERS = 4             # concurrent T119 lookups
+T119_RATE_PER_SEC = 5       # gateway budget for T119 lookups
+REPORT_KEY = "yana_efris:customer_import:"
+
+# ─────────────────────────────────────────────────────
+# Public entrypoint
+# ─────────────────────────────────────────────────────
+@frappe.whitelist()
+def enqueue_bulk_customer_import(e_company_name, tins=None, file_url=None, account_manager=None):
+    """
+    Start a background import of B2B customers from a TIN list.
+    tins: list / JSON list / comma or newline separated text. file_url: CSV File (first column or a "tin" column).
+    """
+    tin_list = parse_tins(tins, file_url)
+    if not tin_list:
+        frappe.throw("No valid TINs found.")
+
+    job_id = enqueue_report_job(
+        "yana_efris.api.customer_import.bulk_import_customers",
+        job_name=f"EFRIS Customer Import ({e_company_name})",
+        e_company_name=e_company_name,
+        tins=tin_list,
+        account_manager=account_manager or frappe.session.user,
+    )
+    return {"job_id": job_id, "tin_count": len(tin_list)}
+
+@frappe.whitelist()
+def get_bulk_customer_import_report(job_id):
+    return get_report(REPORT_KEY, job_id)
+
+def parse_tins(tins=None, file_url=None):
+    """Normalize TIN input to an ordered, de-duplicated list of strings."""
+    values = []
+    if file_url:
+        content = frappe.get_doc("File", {"file_url": file_url}).get_content()
+        if isinstance(content, bytes):
+            content = content.decode("utf-8-sig")
+        rows = list(csv.reader(io.StringIO(content)))
+        column = 0
+        if rows and any(h.strip().lower() in ("tin", "tax_id") for h in rows[0]):
+            column = next(i for i, h in enumerate(rows[0]) if h.strip().lower() in ("tin", "tax_id"))
+            rows = rows[1:]
+        values.extend(row[column] for row in rows if len(row) > column)
+
+    if tins:
+        if isinstance(tins, str):
+            tins = frappe.parse_json(tins) if tins.strip().startswith("[") else re.split(r"[\s,;]+", tins)
+        values.extend(tins)
+
+    seen = set()
+    result = []
+    for tin in values:
+        tin = str(tin or "").strip()
+        if tin and tin not in seen:
+            seen.add(tin)
+            result.append(tin)
+    return result
+
+# ─────────────────────────────────────────────────────
+# Background job
+# ─────────────────────────────────────────────────────
+@bulk_lane()
+def bulk_import_customers(e_company_name, tins, account_manager=None, job_id=None, notify_user=None):
+    conf = frappe.conf
+    report = {tin: {"tin": tin} for tin in tins}
+
+    # 1️⃣ Dedupe against existing Customers with one query
+    existing = frappe.get_all(
+        "Customer",
+        filters={"tax_id": ["in", tins]},
+        fields=["name", "tax_id"],
+    )
+    for row in existing:
+        report[row.tax_id].update(status="Existing", customer=row.name)
+
+    pending = [tin for tin in tins if "status" not in report[tin]]
+
+    # 2️⃣ T119 lookups, concurrent but rate limited
+    lookups = run_concurrently(
+        lambda tin: get_taxpayer(e_company_name, tin),
+        pending,
+        max_workers=cint(conf.get("efris_customer_import_workers") or MAX_WORKERS),
+        rate_per_sec=cint(conf.get("efris_t119_rate_per_sec") or T119_RATE_PER_SEC),
+    )
+
+    to_create = []
+    for tin, taxpayer, error in lookups:
+        if error:
+            report[tin].update(status="Failed", error=str(error))
+        elif not (taxpayer.get("legalName") or taxpayer.get("businessName")):
+            report[tin].update(status="Failed", error="No valid legal/business name found in EFRIS response.")
+        else:
+            to_create.append((tin, taxpayer))
+
+    # 3️⃣ Insert, one commit per batch
+    for start in range(0, len(to_create), BATCH_SIZE):
+        _insert_batch(to_create[start:start + BATCH_SIZE], account_manager, report)
+        frappe.db.commit()
+
+    result = {
+        "job_id": job_id,
+        "company": e_company_name,
+        "summary": {
+            status: sum(1 for r in report.values() if r.get("status") == status)
+            for status in ("Created", "Existing", "Failed")
+        },
+        "rows": list(report.values()),
+    }
+
+    store_report(REPORT_KEY, job_id, result, notify_user, "efris_customer_import_done")
+
+    frappe.logger("yana_efris").info(f"EFRIS customer import for {e_company_name} finished: {result['summary']}")
+    return result
+
+def _insert_batch(rows, account_manager, report):
+    contact_fields = []
+    for tin, taxpayer in rows:
+        frappe.db.savepoint("yana_customer_import")
+        try:
+            customer = new_customer_from_taxpayer(taxpayer, account_manager)
+            customer.insert(ignore_permissions=True)
+        except Exception as e:
+            frappe.db.rollback(save_point="yana_customer_import")
+            report[tin].update(status="Failed", error=str(e))
+            continue
+
+        report[tin].update(status="Created", customer=customer.name, customer_name=customer.customer_name)
+        if taxpayer.get("contactEmail") or taxpayer.get("contactNumber"):
+            contact_fields.append((customer.name, taxpayer.get("contactEmail") or "", taxpayer.get("contactNumber") or ""))
+
+    # email / mobile for the whole batch in one UPDATE (same transaction). Setting them before
+    # insert would make ERPNext create a primary Contact per customer, which query_customer_details avoids too.
+    if contact_fields:
+        frappe.db.sql(
+            """
+            UPDATE `tabCustomer`
+            SET email_id = CASE name {email_cases} ELSE email_id END,
+                mobile_no = CASE name {mobile_cases} ELSE mobile_no END
+            WHERE name IN %(names)s
+            """.format(
+                email_cases=" ".join(f"WHEN %(n{i})s THEN COALESCE(NULLIF(%(e{i})s, ''), email_id)" for i in range(len(contact_fields))),
+                mobile_cases=" ".join(f"WHEN %(n{i})s THEN COALESCE(NULLIF(%(m{i})s, ''), mobile_no)" for i in range(len(contact_fields))),
+            ),
+            {
+                "names": tuple(name for name, _, _ in contact_fields),
+                **{f"n{i}": name for i, (name, _, _) in enumerate(contact_fields)},
+                **{f"e{i}": email for i, (_, email, _) in enumerate(contact_fields)},
+                **{f"m{i}": mobile for i, (_, _, mobile) in enumerate(contact_fields)},
+            },
+        )
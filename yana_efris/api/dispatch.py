@@ -0,0 +1,223 @@
+import time
+from contextlib import ContextDecorator
+
+import frappe
+from frappe.utils import cint, flt
+
+from yana_efris.api.upload import upload_compression
+
+# ─────────────────────────────────────────────────────
+# Config (site_config.json)
+#   efris_dispatch_rate:             gateway budget, EFRIS calls per second for the site (default 10)
+#   efris_interactive_reserved:      share of that budget bulk jobs may never use (default 0.3)
+#   efris_bulk_max_inflight:         concurrent bulk calls (default 4)
+#   efris_interactive_max_inflight:  concurrent interactive calls before they queue (default 16)
+#   efris_bulk_yield_threshold:      interactive calls in flight that make bulk calls wait (default 1)
+# ─────────────────────────────────────────────────────
+INTERACTIVE = "interactive"
+BULK = "bulk"
+LANES = (INTERACTIVE, BULK)
+
+# interface codes a cashier / form waits on; everything else defaults to the bulk lane
+INTERACTIVE_CODES = {"T101", "T103", "T108", "T109", "T110", "T112", "T114", "T119", "T121"}
+
+KEY = "yana_efris:dispatch:"
+INFLIGHT_TTL = 180          # per call: a killed worker's call stops counting after this long
+METRICS_TTL = 2 * 60 * 60
+POLL_INTERVAL = 0.05
+MAX_BULK_WAIT = 30          # bulk calls proceed anyway after this long, so syncs can't starve
+MAX_INTERACTIVE_WAIT = 5    # interactive calls never fail for lack of a slot
+
+
+def _conf(key, default):
+    return flt(frappe.conf.get(key)) or default
+
+
+# ─────────────────────────────────────────────────────
+# Lane selection
+# ─────────────────────────────────────────────────────
+class bulk_lane(ContextDecorator):
+    """
+    Route every EFRIS call in the block (or decorated job) through the bulk lane:
+
+        @bulk_lane()
+        def sync_efris_items(company_name): ...
+
+        with bulk_lane():
+            ...
+    """
+
+    def __enter__(self):
+        self.previous = getattr(frappe.local, "efris_lane", None)
+        frappe.local.efris_lane = BULK
+        return self
+
+    def __exit__(self, *exc):
+        frappe.local.efris_lane = self.previous
+        return False
+
+
+def current_lane():
+    return getattr(frappe.local, "efris_lane", None)
+
+
+def lane_for(interface_code, lane=None):
+    if lane in LANES:
+        return lane
+    return current_lane() or (INTERACTIVE if interface_code in INTERACTIVE_CODES else BULK)
+
+
+# ─────────────────────────────────────────────────────
+# Slots (shared by all workers)
+#   in flight: one sorted set per lane, call id -> deadline; entries past their
+#              deadline (worker killed mid-call) are pruned on every read
+#   rate:      one counter per second
+# ─────────────────────────────────────────────────────
+def _inflight_key(lane):
+    return frappe.cache().make_key(f"{KEY}inflight_calls:{lane}")
+
+
+def _inflight(lane):
+    key = _inflight_key(lane)
+    pipe = frappe.cache().pipeline()
+    pipe.zremrangebyscore(key, "-inf", time.time())
+    pipe.zcard(key)
+    return cint(pipe.execute()[1])
+
+
+def _rate_count(second):
+    return cint(frappe.cache().get(frappe.cache().make_key(f"{KEY}rate:{second}")))
+
+
+def _take_rate_slot(second):
+    cache = frappe.cache()
+    key = cache.make_key(f"{KEY}rate:{second}")
+    count = cache.incr(key)
+    if count == 1:
+        cache.expire(key, 2)
+    return count
+
+
+def _can_start(lane):
+    rate = _conf("efris_dispatch_rate", 10)
+    second = int(time.time())
+
+    if lane == INTERACTIVE:
+        if _inflight(INTERACTIVE) >= _conf("efris_interactive_max_inflight", 16):
+            return False
+        return _rate_count(second) < rate
+
+    # bulk: yield to cashiers, stay inside its own concurrency and the unreserved share of the budget
+    if _inflight(INTERACTIVE) >= _conf("efris_bulk_yield_threshold", 1):
+        return False
+    if _inflight(BULK) >= _conf("efris_bulk_max_inflight", 4):
+        return False
+    return _rate_count(second) < rate * (1 - _conf("efris_interactive_reserved", 0.3))
+
+
+def acquire(lane):
+    """Wait for a slot in `lane`; returns (call id, seconds waited)."""
+    start = time.monotonic()
+    max_wait = MAX_INTERACTIVE_WAIT if lane == INTERACTIVE else MAX_BULK_WAIT
+    while not _can_start(lane) and time.monotonic() - start < max_wait:
+        time.sleep(POLL_INTERVAL)
+
+    cache = frappe.cache()
+    call_id = frappe.generate_hash(length=12)
+    _take_rate_slot(int(time.time()))
+    pipe = cache.pipeline()
+    pipe.zadd(_inflight_key(lane), {call_id: time.time() + INFLIGHT_TTL})
+    pipe.expire(_inflight_key(lane), INFLIGHT_TTL)
+    pipe.execute()
+    return call_id, time.monotonic() - start
+
+
+def release(lane, call_id):
+    frappe.cache().zrem(_inflight_key(lane), call_id)
+
+
+# ─────────────────────────────────────────────────────
+# Metrics (per lane, per minute buckets)
+# ─────────────────────────────────────────────────────
+def _record_wait(lane, waited):
+    cache = frappe.cache()
+    key = cache.make_key(f"{KEY}metrics:{lane}:{int(time.time() // 60)}")
+    wait_ms = int(waited * 1000)
+    pipe = cache.pipeline()
+    pipe.hincrby(key, "calls", 1)
+    pipe.hincrby(key, "wait_ms", wait_ms)
+    pipe.hincrby(key, "waited", 1 if wait_ms else 0)
+    pipe.expire(key, METRICS_TTL)
+    pipe.execute()
+
+    max_key = cache.make_key(f"{KEY}metrics_max:{lane}:{int(time.time() // 60)}")
+    if wait_ms > cint(cache.get(max_key)):
+        cache.set(max_key, wait_ms, ex=METRICS_TTL)
+
+
+@frappe.whitelist()
+def get_dispatch_metrics(minutes=15):
+    """Calls, queue-wait (avg / max ms) and current in-flight per lane over the last `minutes`."""
+    frappe.only_for("System Manager")
+    cache = frappe.cache()
+    now_minute = int(time.time() // 60)
+    minutes = min(cint(minutes) or 15, METRICS_TTL // 60)
+
+    # raw pipeline reads: RedisWrapper.hgetall would try to unpickle the counters
+    window = range(now_minute - minutes + 1, now_minute + 1)
+    pipe = cache.pipeline()
+    for lane in LANES:
+        for minute in window:
+            pipe.hgetall(cache.make_key(f"{KEY}metrics:{lane}:{minute}"))
+            pipe.get(cache.make_key(f"{KEY}metrics_max:{lane}:{minute}"))
+    replies = iter(pipe.execute())
+
+    metrics = {}
+    for lane in LANES:
+        calls = wait_ms = waited = max_wait = 0
+        for _minute in window:
+            bucket, bucket_max = next(replies) or {}, next(replies)
+            calls += cint(bucket.get(b"calls"))
+            wait_ms += cint(bucket.get(b"wait_ms"))
+            waited += cint(bucket.get(b"waited"))
+            max_wait = max(max_wait, cint(bucket_max))
+        metrics[lane] = {
+            "calls": calls,
+            "queued_calls": waited,
+            "avg_wait_ms": round(wait_ms / calls, 1) if calls else 0,
+            "max_wait_ms": max_wait,
+            "inflight": _inflight(lane),
+        }
+    return {"minutes": minutes, "lanes": metrics}
+
+
+# ─────────────────────────────────────────────────────
+# Dispatch
+# ─────────────────────────────────────────────────────
+def efris_post(interfaceCode, content, company_name, lane=None, **kwargs):
+    """
+    make_post behind the priority lanes. Same arguments and (status, response)
+    result; `lane` overrides the interface-code / bulk_lane() default.
+    """
+    from uganda_compliance.efris.api_classes.efris_api import make_post
+
+    def post():
+        # gzip-able content (efris_upload_mode = "gzip") is compressed inside make_post's encrypt step
+        with upload_compression(interfaceCode):
+            return make_post(interfaceCode=interfaceCode, content=content, company_name=company_name, **kwargs)
+
+    lane = lane_for(interfaceCode, lane)
+    try:
+        call_id, waited = acquire(lane)
+    except Exception:
+        # Redis trouble must not block fiscalization - post without lane accounting
+        return post()
+
+    try:
+        return post()
+    finally:
+        try:
+            release(lane, call_id)
+            _record_wait(lane, waited)
+        except Exception:
+            pass
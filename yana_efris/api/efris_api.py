@@ -1,17 +1,26 @@
 import frappe
 from frappe import _
-from frappe.utils import today
+from frappe.utils import cint, today
 from uganda_compliance.efris.api_classes.e_invoice import EInvoiceAPI
-from uganda_compliance.efris.api_classes.efris_api import make_post
 from uganda_compliance.efris.utils.utils import efris_log_info, efris_log_error
 
 import json, base64, gzip
 from Crypto.Cipher import AES
 import frappe
 from uganda_compliance.efris.doctype.e_invoice_request_log.e_invoice_request_log import log_request_to_efris
+from yana_efris.api.dispatch import BULK, bulk_lane, efris_post
+from yana_efris.api.efris_settings import get_company_settings
+from yana_efris.api.einvoice_batch import BATCH_SIZE, create_einvoices, clear_prefetch
+from yana_efris.api.locks import document_name, single_flight
+from yana_efris.api.offline_queue import is_queued, post_or_queue
+from yana_efris.api.preflight import format_errors, preflight_enabled, validate_t109
+from yana_efris.api.profiling import profile_invoice
+from yana_efris.api.serialization import dumps, loads
+from yana_efris.api.upload import prepare_upload
 
 
 @frappe.whitelist()
+@single_flight("get_exchange_rate", lambda args: args["currency"] and f"{args['company_name']}:{args['currency']}")
 def get_exchange_rate(currency=None, company_name=None):
     """
     Fetch exchange rate for a currency.
@@ -20,10 +29,8 @@ def get_exchange_rate(currency=None, company_name=None):
     3. If not found, call EFRIS, insert/update, and return.
     """
     try:
-        from uganda_compliance.efris.api_classes.efris_api import make_post
-
         # Get company's base currency
-        company_currency = frappe.db.get_value("Company", company_name, "default_currency")
+        company_currency = get_company_settings(company_name).default_currency
 
         # 🛑 If same currency → no conversion needed
         if company_currency == currency:
@@ -49,7 +56,7 @@ def get_exchange_rate(currency=None, company_name=None):
             "currency": currency,
         }
 
-        success, response = make_post(
+        success, response = efris_post(
             interfaceCode=interfaceCode,
             content=content,
             company_name=company_name
@@ -83,20 +90,52 @@ def get_exchange_rate(currency=None, company_name=None):
         # frappe.throw(f"EFRIS exchange rate call failed: {e}")
 
 @frappe.whitelist()
+def get_exchange_rates(currencies, company_name=None):
+    """
+    Batch version of get_exchange_rate for the client-side rate cache.
+    Today's Currency Exchange rows for all currencies are read in one query;
+    only the missing ones go to EFRIS (T121 takes one currency per call).
+    Returns { currency: rate }.
+    """
+    currencies = frappe.parse_json(currencies) if isinstance(currencies, str) else currencies
+    currencies = [c for c in dict.fromkeys(currencies or []) if c]
+    company_currency = get_company_settings(company_name).default_currency
+
+    rates = {c: 1.0 for c in currencies if c == company_currency}
+    missing = [c for c in currencies if c not in rates]
+    if missing:
+        for row in frappe.get_all(
+            "Currency Exchange",
+            filters={"from_currency": ["in", missing], "to_currency": company_currency, "date": today()},
+            fields=["from_currency", "exchange_rate"],
+        ):
+            if row.exchange_rate:
+                rates[row.from_currency] = float(row.exchange_rate)
+
+    for currency in missing:
+        if currency in rates:
+            continue
+        response = get_exchange_rate(currency, company_name) or {}
+        rate = float(response.get("rate") or 0)
+        if rate:
+            rates[currency] = rate
+
+    return rates
+
+@frappe.whitelist()
+@single_flight("fetch_efris_branches", lambda args: args["company_name"] or "default")
 def fetch_efris_branches(company_name=None):
     """
     Simple flow:
-      - call EFRIS T138 (make_post)
+      - call EFRIS T138 (efris_post, bulk lane)
       - for each returned branch, find Company with exact matching company_name or name
         (case-insensitive, trimmed)
       - set Company.custom_branch_id = branchId via db_set
     Returns: { success: True, mapped: [...], not_found: [...] } or error
     """
     try:
-        # import your make_post helper (adjust path as needed)
-        from uganda_compliance.efris.api_classes.efris_api import make_post
-
-        status, response = make_post(interfaceCode="T138", content=None, company_name=company_name)
+        # branch sync is background work - keep it out of the cashiers' lane
+        status, response = efris_post(interfaceCode="T138", content=None, company_name=company_name, lane=BULK)
         if not status:
             frappe.log_error(f"EFRIS T138 failed: {response}", "Yana EFRIS - fetch_efris_branches_and_map")
             return {"success": False, "error": response}
@@ -111,6 +150,7 @@ def fetch_efris_branches(company_name=None):
 
         mapped = []
         not_found = []
+        candidates = frappe.get_all("Company", fields=["name", "company_name"])
 
         for b in items:
             branch_id = b.get("branchId") or b.get("branch_id") or ""
@@ -122,8 +162,7 @@ def fetch_efris_branches(company_name=None):
 
             # Exact match search (case-insensitive). First try company_name, then name.
             # Using filters with "=" does case-sensitive matching in DB, so perform normalized compare in Python.
-            # Fetch candidate companies and compare normalized strings to simulate case-insensitive exact match.
-            candidates = frappe.get_all("Company", fields=["name", "company_name"])
+            # Compare normalized strings against the candidate companies (loaded once above) to simulate case-insensitive exact match.
             matched_company = None
             lower_branch = branch_name.lower()
 
@@ -159,6 +198,12 @@ def fetch_efris_branches(company_name=None):
         return {"success": False, "error": str(e)}
 
 @staticmethod
+@single_flight(
+    "generate_irn",
+    lambda args: document_name(args["sales_invoice"]),
+    lock_ttl=300,
+    message="This invoice is already being submitted to EFRIS; showing the result of that submission.",
+)
 def generate_irn(sales_invoice):
     """
     Entry point (server-side) that builds the EFRIS payload and submits it.
@@ -170,26 +215,64 @@ def generate_irn(sales_invoice):
     sales_invoice = EInvoiceAPI.parse_sales_invoice(sales_invoice)
     efris_log_info(f"after parse done... Sales Invoice: {sales_invoice.name}")
 
-    # Create E Invoice doc (traceability) and fetch any additional details
-    einvoice = EInvoiceAPI.create_einvoice(sales_invoice.name)
-    einvoice.fetch_invoice_details()
+    # efris_profile=1 on the request (System Manager) logs a cProfile report for this invoice
+    with profile_invoice(sales_invoice.name):
+        # Create E Invoice doc (traceability) and fetch any additional details
+        einvoice = EInvoiceAPI.create_einvoice(sales_invoice.name)
+        einvoice.fetch_invoice_details()
+
+        status, response = submit_einvoice(sales_invoice, einvoice)
 
+    if status:
+        efris_log_info(f"EFRIS Generated Successfully. :{einvoice.name}")
+        frappe.msgprint(_("EFRIS Generated Successfully."), alert=1)
+    elif is_queued(response):
+        # offline mode: the replay worker submits it once EFRIS is reachable again
+        efris_log_info(f"EFRIS offline, queued {sales_invoice.name} as {response['offline_queue']}")
+        frappe.msgprint(_(response["message"]), indicator="orange", alert=1)
+    else:
+        # response may be dict or str; keep it readable
+        frappe.throw(response, title=_('EFRIS Generation Failed'))
+
+    return status, response
+
+@single_flight(
+    "submit_einvoice",
+    lambda args: document_name(args["sales_invoice"]),
+    lock_ttl=300,
+    message="This invoice is already being submitted to EFRIS; showing the result of that submission.",
+)
+def submit_einvoice(sales_invoice, einvoice):
+    """Build the T109 payload for an already created E Invoice and post it. Returns (status, response)."""
     # Build payload - pass sales_invoice doc into get_einvoice_json so we can read branch/company directly
-    einvoice_json = einvoice.get_einvoice_json(sales_invoice)
+    einvoice_json = prepare_upload(einvoice.get_einvoice_json(sales_invoice))
 
     # debug log seller part to verify branch fields are present
     try:
         seller_part = einvoice_json.get("sellerDetails") or einvoice_json.get("sellerDetails", {})
-        efris_log_info(f"Built sellerDetails for {sales_invoice.name}: {frappe.as_json(seller_part)}")
+        efris_log_info(f"Built sellerDetails for {sales_invoice.name}: {dumps(seller_part)}")
     except Exception:
         # fallback safe logging
         efris_log_info("Built einvoice_json (sellerDetails logging failed)")
 
     company_name = sales_invoice.company
-    efris_log_info(f"[YANA DEBUG] taxDetails JSON: {frappe.as_json(einvoice_json.get('taxDetails'))}")
-    efris_log_info(f"[YANA DEBUG] goodsDetails JSON: {frappe.as_json(einvoice_json.get('goodsDetails'))}")
 
-    status, response = make_post(
+    # local pre-flight: required fields and tax arithmetic fail before any encrypt/POST;
+    # unconfirmed fields, the placeholder email and the goods mirror only warn
+    if preflight_enabled():
+        errors, warnings = validate_t109(einvoice_json, company_name)
+        for warning in warnings:
+            efris_log_info(f"[YANA PREFLIGHT] {sales_invoice.name}: {warning}")
+        if errors:
+            efris_log_info(f"[YANA PREFLIGHT] {sales_invoice.name} rejected locally: {errors}")
+            return False, format_errors(errors)
+
+    efris_log_info(f"[YANA DEBUG] taxDetails JSON: {dumps(einvoice_json.get('taxDetails'))}")
+    efris_log_info(f"[YANA DEBUG] goodsDetails JSON: {dumps(einvoice_json.get('goodsDetails'))}")
+
+    # posts to EFRIS, or persists the built payload in EFRIS Offline Queue during an outage
+    status, response = post_or_queue(
+        efris_post,
         interfaceCode="T109",
         content=einvoice_json,
         company_name=company_name,
@@ -199,14 +282,44 @@ def generate_irn(sales_invoice):
 
     if status:
         EInvoiceAPI.handle_successful_irn_generation(einvoice, response)
-        efris_log_info(f"EFRIS Generated Successfully. :{einvoice.name}")
-        frappe.msgprint(_("EFRIS Generated Successfully."), alert=1)
-    else:
-        # response may be dict or str; keep it readable
-        frappe.throw(response, title=_('EFRIS Generation Failed'))
 
     return status, response
 
+@frappe.whitelist()
+def generate_irn_bulk(sales_invoices):
+    """
+    Submit many Sales Invoices to EFRIS. E Invoices are created in batches
+    (Company prefetch, failures isolated per invoice, a commit per batch) and
+    then posted one by one.
+    Returns a per-invoice result list instead of throwing on the first failure.
+    """
+    if isinstance(sales_invoices, str):
+        sales_invoices = frappe.parse_json(sales_invoices)
+
+    results = []
+    # bulk submissions yield to cashiers fiscalizing one invoice at a time
+    with bulk_lane():
+        for start in range(0, len(sales_invoices), BATCH_SIZE):
+            batch = [EInvoiceAPI.parse_sales_invoice(si) for si in sales_invoices[start:start + BATCH_SIZE]]
+            einvoices = create_einvoices(batch)
+
+            for si in batch:
+                einvoice = einvoices.get(si.name)
+                if not einvoice:
+                    results.append({"sales_invoice": si.name, "success": False, "response": "E Invoice creation failed"})
+                    continue
+                try:
+                    status, response = submit_einvoice(si, einvoice)
+                except Exception as e:
+                    frappe.log_error(frappe.get_traceback(), f"EFRIS bulk submit failed: {si.name}")
+                    status, response = False, str(e)
+                results.append({"sales_invoice": si.name, "success": status, "response": response})
+
+            clear_prefetch()
+
+    efris_log_info(f"[YANA BULK] Submitted {len(results)} invoices, {sum(1 for r in results if r['success'])} succeeded")
+    return results
+
 @staticmethod
 def decrypt_aes_ecb(aeskey, ciphertext):
 
@@ -227,7 +340,7 @@ def decrypt_aes_ecb(aeskey, ciphertext):
         # Step 3: Try to parse JSON directly
         try:
             text = data.decode("utf-8")
-            json.loads(text)  # validate
+            loads(data)  # validate
             return text
         except:
             frappe.log_error("ℹ Not valid JSON yet. Trying AES decrypt...", "DEBUG")
@@ -254,15 +367,26 @@ def decrypt_aes_ecb(aeskey, ciphertext):
         frappe.log_error(f"❌ FINAL decrypt error: {e}", "DEBUG")
         raise
 
-@frappe.whitelist()
-def query_customer_details(doc, e_company_name, tax_id, ninBrn,accountManager):
-    # 1️⃣ Call EFRIS API
+TAXPAYER_CACHE_PREFIX = "yana_efris:t119_taxpayer:"
+TAXPAYER_CACHE_TTL = 6 * 60 * 60  # taxpayer registrations rarely change within a day
+
+def get_taxpayer(e_company_name, tax_id, ninBrn=None, force_refresh=False):
+    """
+    T119 taxpayer lookup with a shared TTL cache (keyed by tin + ninBrn).
+    force_refresh skips the cache and stores the fresh response.
+    """
+    cache_key = f"{TAXPAYER_CACHE_PREFIX}{tax_id or ''}:{ninBrn or ''}"
+    if not force_refresh:
+        taxpayer = frappe.cache().get_value(cache_key)
+        if taxpayer:
+            return taxpayer
+
     query_customer_details_T119 = {
         "tin": tax_id,
         "ninBrn": ninBrn
     }
 
-    success, response = make_post(
+    success, response = efris_post(
         interfaceCode="T119",
         content=query_customer_details_T119,
         company_name=e_company_name,
@@ -271,33 +395,22 @@ def query_customer_details(doc, e_company_name, tax_id, ninBrn,accountManager):
     if not success:
         frappe.throw(f"Failed to fetch customer details from EFRIS. Response: {response}")
 
-    # 2️⃣ Extract taxpayer info
     taxpayer = response.get("taxpayer")
     if not taxpayer:
         frappe.throw("EFRIS did not return taxpayer information.")
 
-    # 3️⃣ Choose customer name
-    customer_name = taxpayer.get("legalName") or taxpayer.get("businessName")
-    if not customer_name:
-        frappe.throw("No valid legal/business name found in EFRIS response.")
-
-    # 4️⃣ Optional: double-check if already exists by tax_id
-    existing = frappe.db.get_value("Customer", {"tax_id": taxpayer.get("tin")}, "name")
-    if existing:
-        return {
-            "customer_name": existing,
-            "message": "Existing customer returned."
-        }
+    frappe.cache().set_value(cache_key, taxpayer, expires_in_sec=TAXPAYER_CACHE_TTL)
+    return taxpayer
 
-    # 5️⃣ Create new Customer
+def new_customer_from_taxpayer(taxpayer, account_manager):
+    """Unsaved B2B Customer doc built from a T119 taxpayer dict (email/mobile are left to the caller)."""
     customer = frappe.new_doc("Customer")
-    customer.customer_name = customer_name
+    customer.customer_name = taxpayer.get("legalName") or taxpayer.get("businessName")
     customer.customer_type = "Company"
     customer.efris_customer_type = "B2B"  # ✅ Custom field (make sure it exists)
-    customer.account_manager = accountManager
+    customer.account_manager = account_manager
     customer.customer_group = "Commercial"
 
-    # 6️⃣ Map optional fields
     if taxpayer.get("tin"):
         customer.tax_id = taxpayer.get("tin")
 
@@ -306,6 +419,43 @@ def query_customer_details(doc, e_company_name, tax_id, ninBrn,accountManager):
         # If you created a custom field, it's fine.
         customer.primary_address = taxpayer.get("address")
 
+    return customer
+
+@frappe.whitelist()
+@single_flight("query_customer_details", lambda args: (args["tax_id"] or args["ninBrn"]) and f"{args['e_company_name']}:{args['tax_id']}:{args['ninBrn']}")
+def query_customer_details(doc, e_company_name, tax_id, ninBrn, accountManager, force_refresh=False):
+    force_refresh = cint(force_refresh)
+
+    # 1️⃣ Local Customer first - no EFRIS call needed if we already know this TIN
+    if tax_id and not force_refresh:
+        existing = frappe.db.get_value("Customer", {"tax_id": tax_id}, "name")
+        if existing:
+            return {
+                "customer_id": existing,
+                "customer_name": existing,
+                "message": "Existing customer returned."
+            }
+
+    # 2️⃣ Taxpayer info from EFRIS T119 (cached)
+    taxpayer = get_taxpayer(e_company_name, tax_id, ninBrn, force_refresh=force_refresh)
+
+    # 3️⃣ Choose customer name
+    customer_name = taxpayer.get("legalName") or taxpayer.get("businessName")
+    if not customer_name:
+        frappe.throw("No valid legal/business name found in EFRIS response.")
+
+    # 4️⃣ Optional: double-check if already exists by tax_id
+    existing = frappe.db.get_value("Customer", {"tax_id": taxpayer.get("tin")}, "name")
+    if existing:
+        return {
+            "customer_id": existing,
+            "customer_name": existing,
+            "message": "Existing customer returned."
+        }
+
+    # 5️⃣ Create new Customer (6️⃣ optional fields mapped in new_customer_from_taxpayer)
+    customer = new_customer_from_taxpayer(taxpayer, accountManager)
+
     customer.insert(ignore_permissions=True)   # <--- NO contact created here (email/mobile empty)
     frappe.db.commit()
 
@@ -334,7 +484,7 @@ def fetch_items_from_efris(pageNo,pageSize,company_name):
         "pageSize": pageSize,
     }
 
-    success, response = make_post(
+    success, response = efris_post(
         interfaceCode="T127",
         content=fetch_items_T127,
         company_name=company_name,
@@ -0,0 +1,139 @@
+import pickle
+import time
+
+import frappe
+from frappe.utils import cint
+
+from yana_efris.api.efris_item_sync import PAGE_SIZE, fetch_efris_items_page
+from yana_efris.api.goods_registration import REGISTRATION_ROLES
+
+# ─────────────────────────────────────────────────────
+# Config
+# ─────────────────────────────────────────────────────
+PAGE_TTL = 5 * 60           # seconds a decoded T127 page stays fresh
+MAX_CACHED_PAGES = 200      # per company, least recently used pages are evicted
+PAGE_KEY = "yana_efris:t127_page:"
+LRU_KEY = "yana_efris:t127_pages:"     # sorted set per company: page key -> last used (unix time)
+
+# ─────────────────────────────────────────────────────
+# Page cache (Redis, TTL + per-company LRU index)
+# ─────────────────────────────────────────────────────
+def _page_key(company_name, page_no, page_size):
+    return f"{PAGE_KEY}{company_name}:{cint(page_size)}:{cint(page_no)}"
+
+def _lru_key(company_name):
+    return frappe.cache().make_key(LRU_KEY + company_name)
+
+def _touch(company_name, key):
+    """Mark `key` as just used and evict the least recently used pages past MAX_CACHED_PAGES (one MULTI)."""
+    cache = frappe.cache()
+    lru_key = _lru_key(company_name)
+    pipe = cache.pipeline()
+    pipe.zadd(lru_key, {key: time.time()})
+    pipe.zrange(lru_key, 0, -MAX_CACHED_PAGES - 1)
+    pipe.zremrangebyrank(lru_key, 0, -MAX_CACHED_PAGES - 1)
+    pipe.expire(lru_key, PAGE_TTL * 2)
+    evicted = pipe.execute()[1]
+    if evicted:
+        cache.delete(*[cache.make_key(k.decode() if isinstance(k, bytes) else k) for k in evicted])
+
+def get_cached_page(company_name, page_no, page_size=PAGE_SIZE, refresh=False):
+    """Return (records, page_info, from_cache) for one T127 page."""
+    key = _page_key(company_name, page_no, page_size)
+    cached = None if refresh else frappe.cache().get_value(key)
+    if cached is not None:
+        _touch(company_name, key)
+        return cached["records"], cached["page"], True
+
+    records, page_info = fetch_efris_items_page(company_name, page_no, page_size)
+    if records:
+        frappe.cache().set_value(key, {"records": records, "page": page_info}, expires_in_sec=PAGE_TTL)
+        _touch(company_name, key)
+    return records, page_info, False
+
+def prefetch_page(company_name, page_no, page_size=PAGE_SIZE):
+    """Background job: warm the cache for a page the user is likely to open next."""
+    if frappe.cache().get_value(_page_key(company_name, page_no, page_size)) is None:
+        get_cached_page(company_name, page_no, page_size)
+
+def _matches(record, search):
+    search = search.lower()
+    return search in (record.get("goodsCode") or "").lower() or search in (record.get("goodsName") or "").lower()
+
+# ─────────────────────────────────────────────────────
+# Browsing API
+# ─────────────────────────────────────────────────────
+def _check_access(company_name):
+    """Same roles as goods registration, and read access to the company (User Permissions apply)."""
+    frappe.only_for(REGISTRATION_ROLES)
+    frappe.has_permission("Company", "read", company_name, throw=True)
+
+@frappe.whitelist()
+def browse_efris_items(company_name, cursor=None, page_size=PAGE_SIZE, search=None, prefetch=1, refresh=0):
+    """
+    Cursor based T127 browsing. `cursor` is the page number returned as next_cursor
+    by the previous call (first page when empty). Decoded pages are cached per company,
+    and the following page is prefetched in the background.
+    """
+    _check_access(company_name)
+    page_no = max(1, cint(cursor) or 1)
+    page_size = cint(page_size) or PAGE_SIZE
+
+    records, page_info, from_cache = get_cached_page(company_name, page_no, page_size, refresh=cint(refresh))
+
+    page_count = cint((page_info or {}).get("pageCount") or 0)
+    has_next = bool(records) and (not page_count or page_no < page_count)
+
+    if has_next and cint(prefetch):
+        frappe.enqueue(
+            "yana_efris.api.efris_catalog.prefetch_page",
+            queue="short",
+            job_id=f"efris_t127_prefetch::{company_name}::{page_size}::{page_no + 1}",
+            deduplicate=True,
+            company_name=company_name,
+            page_no=page_no + 1,
+            page_size=page_size,
+        )
+
+    if search:
+        records = [r for r in records if _matches(r, search)]
+
+    return {
+        "records": records,
+        "page": page_info,
+        "cursor": str(page_no),
+        "next_cursor": str(page_no + 1) if has_next else None,
+        "cached": from_cache,
+    }
+
+@frappe.whitelist()
+def search_cached_efris_items(company_name, search, limit=50):
+    """Filter by goods code or name across every page currently cached for the company (no EFRIS call)."""
+    _check_access(company_name)
+    limit = cint(limit) or 50
+    cache = frappe.cache()
+    lru_key = _lru_key(company_name)
+    keys = [k.decode() if isinstance(k, bytes) else k for k in cache.zrevrange(lru_key, 0, -1)]
+    if not keys:
+        return []
+
+    # one round trip for every cached page, most recently used first
+    pages = cache.mget([cache.make_key(k) for k in keys])
+    expired = [k for k, page in zip(keys, pages, strict=True) if page is None]
+    if expired:
+        cache.zrem(lru_key, *expired)
+
+    results, seen = [], set()
+    for raw in pages:
+        if raw is None:
+            continue
+        page = pickle.loads(raw)
+        for record in page["records"]:
+            code = record.get("goodsCode")
+            if code in seen or not _matches(record, search):
+                continue
+            seen.add(code)
+            results.append(record)
+            if len(results) >= limit:
+                return results
+    return results
@@ -1,6 +1,9 @@
 import frappe
 from frappe.utils import cint, now_datetime
 import math
+from yana_efris.api.dispatch import bulk_lane, efris_post
+from yana_efris.api.efris_settings import find_tax_template
+from yana_efris.yana_efris.doctype.efris_goods.efris_goods import upsert_goods
 
 # ─────────────────────────────────────────────────────
 # Config
@@ -75,11 +78,8 @@ def get_tax_template_for_company(company_name: str, rec: dict):
     elif "deemed" in (rec.get("goodsName") or "").lower():
         title_hint = "Deemed"
 
-    filters = {"company": company_name}
-    if title_hint:
-        filters["title"] = ["like", f"%{title_hint}%"]
-
-    template = frappe.db.get_value("Item Tax Template", filters, "name")
+    # served from the per-worker settings cache - no query per synced item
+    template = find_tax_template(company_name, title_hint)
 
     if not template:
         frappe.log_error(
@@ -102,6 +102,7 @@ def update_progress(progress_doc, page_no: int, offset: int):
 # ─────────────────────────────────────────────────────
 # Main sync job (incremental, per-company, paginated)
 # ─────────────────────────────────────────────────────
+@bulk_lane()
 def sync_efris_items(company_name: str):
     created_count = 0
 
@@ -174,10 +175,8 @@ def sync_efris_items(company_name: str):
 # Fetch one page from EFRIS
 # ─────────────────────────────────────────────────────
 def fetch_efris_items_page(company_name: str, page_no: int, page_size: int):
-    from uganda_compliance.efris.api_classes.efris_api import make_post
-
     payload = {"pageNo": cint(page_no), "pageSize": cint(page_size)}
-    success, response = make_post(
+    success, response = efris_post(
         interfaceCode="T127",
         content=payload,
         company_name=company_name,
@@ -198,6 +197,12 @@ def fetch_efris_items_page(company_name: str, page_no: int, page_size: int):
     records = msg.get("records", []) or []
     page_info = msg.get("page", {}) or {}
 
+    # keep the local EFRIS Goods mirror current with every page we fetch
+    try:
+        upsert_goods(company_name, records)
+    except Exception:
+        frappe.log_error(frappe.get_traceback(), "EFRIS GOODS MIRROR UPDATE FAILED")
+
     # Keep title short
     frappe.log_error(
         "EFRIS T127 FETCH",
@@ -239,6 +244,7 @@ def create_simple_item(rec,company_name):
 
     try:
         item.insert(ignore_permissions=True)
+        frappe.db.set_value("EFRIS Goods", {"company": company_name, "goods_code": code}, "item", code)
         # frappe.log_error(f"INSERTED: {code}", "DEBUG-SYNC")
         return True
     except Exception as e:
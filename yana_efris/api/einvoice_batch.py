@@ -0,0 +1,93 @@
+import frappe
+from uganda_compliance.efris.api_classes.e_invoice import EInvoiceAPI
+from uganda_compliance.efris.utils.utils import efris_log_info
+
+# ─────────────────────────────────────────────────────
+# Config
+# ─────────────────────────────────────────────────────
+BATCH_SIZE = 50  # invoices per prefetch / commit boundary
+
+# ─────────────────────────────────────────────────────
+# Prefetch helpers (one IN query per batch)
+# ─────────────────────────────────────────────────────
+def prefetch_invoice_context(sales_invoices):
+    """
+    Load the Companies (and branch companies) referenced by a batch of Sales
+    Invoice docs and keep them on frappe.local for the builders. Only what our
+    builders read through get_prefetched_doc is prefetched - the Customer / Item
+    / tax lookups happen inside uganda_compliance and can't be routed here.
+    """
+    companies = set()
+    for si in sales_invoices:
+        companies.add(si.company)
+        if si.get("custom_branch"):
+            companies.add(si.custom_branch)
+
+    cache = {"Company": _get_docs_by_name("Company", companies)}
+    frappe.local.yana_efris_prefetch = cache
+    return cache
+
+def get_prefetched_doc(doctype, name):
+    """Return the prefetched record for (doctype, name), falling back to frappe.get_doc."""
+    cache = getattr(frappe.local, "yana_efris_prefetch", None) or {}
+    doc = (cache.get(doctype) or {}).get(name)
+    if doc is not None:
+        return doc
+    return frappe.get_doc(doctype, name)
+
+def clear_prefetch():
+    frappe.local.yana_efris_prefetch = None
+
+def _get_docs_by_name(doctype, names):
+    names = [n for n in names if n]
+    if not names:
+        return {}
+    rows = frappe.get_all(doctype, filters={"name": ["in", names]}, fields=["*"])
+    return {row.name: row for row in rows}
+
+def _rollback_invoice():
+    """
+    Undo a failed invoice. uganda_compliance may commit inside create_einvoice,
+    which releases the savepoint; the transaction then holds only the failed
+    invoice's own work, so a full rollback undoes exactly that.
+    """
+    try:
+        frappe.db.rollback(save_point="yana_einvoice")
+    except Exception:
+        frappe.db.rollback()
+
+# ─────────────────────────────────────────────────────
+# Bulk E Invoice creation
+# ─────────────────────────────────────────────────────
+def create_einvoices(sales_invoices, batch_size=BATCH_SIZE):
+    """
+    Bulk variant of EInvoiceAPI.create_einvoice + fetch_invoice_details.
+    sales_invoices: list of Sales Invoice docs (or names).
+    Returns { sales_invoice_name: einvoice_doc }; invoices that failed are left out.
+
+    Each invoice still goes through uganda_compliance (its own lookups and
+    commits); the batch adds the Company prefetch, per-invoice failure isolation
+    and a commit at every batch boundary.
+    """
+    sales_invoices = [EInvoiceAPI.parse_sales_invoice(si) for si in sales_invoices]
+    einvoices = {}
+
+    for start in range(0, len(sales_invoices), batch_size):
+        batch = sales_invoices[start:start + batch_size]
+        prefetch_invoice_context(batch)
+
+        for si in batch:
+            # savepoint per invoice so one bad invoice doesn't roll back the batch
+            frappe.db.savepoint("yana_einvoice")
+            try:
+                einvoice = EInvoiceAPI.create_einvoice(si.name)
+                einvoice.fetch_invoice_details()
+                einvoices[si.name] = einvoice
+            except Exception:
+                _rollback_invoice()
+                frappe.log_error(frappe.get_traceback(), f"E Invoice bulk create failed: {si.name}")
+        frappe.db.commit()
+
+        efris_log_info(f"[YANA BULK] Created {len(batch)} E Invoices (batch starting at {start})")
+
+    return einvoices
@@ -0,0 +1,157 @@
+import frappe
+from frappe.utils import cint, flt
+
+from yana_efris.api.concurrency import run_concurrently
+from yana_efris.api.dispatch import bulk_lane, efris_post
+from yana_efris.api.jobs import enqueue_report_job, get_report, rejected_goods, store_report
+from yana_efris.api.serialization import format_amount
+from yana_efris.yana_efris.doctype.efris_goods.efris_goods import upsert_goods
+
+# ─────────────────────────────────────────────────────
+# Config (override in site_config.json)
+# ─────────────────────────────────────────────────────
+T130_CHUNK = 100            # goods per T130 upload request (interface maximum)
+MAX_WORKERS = 2             # concurrent T130 uploads (efris_goods_upload_workers)
+T130_RATE_PER_SEC = 1       # gateway budget for T130 (efris_t130_rate_per_sec)
+DEFAULT_CURRENCY_CODE = "101"   # UGX
+REPORT_KEY = "yana_efris:goods_registration:"
+REGISTRATION_ROLES = ["System Manager", "Stock Manager", "Item Manager"]
+
+# Item columns some uganda_compliance versions add (read only when present)
+COMMODITY_COLUMNS = ("efris_commodity_code", "custom_efris_commodity_code")
+UOM_CODE_COLUMNS = ("efris_uom_code", "custom_efris_uom_code")
+
+# ─────────────────────────────────────────────────────
+# Public entrypoint
+# ─────────────────────────────────────────────────────
+@frappe.whitelist()
+def enqueue_goods_registration(company):
+    """Register every local Item of `company` that is not yet in its EFRIS goods catalog."""
+    frappe.only_for(REGISTRATION_ROLES)
+    job_id = enqueue_report_job(
+        "yana_efris.api.goods_registration.register_goods",
+        job_name=f"EFRIS Goods Registration ({company})",
+        company=company,
+    )
+    return {"job_id": job_id, "pending": len(get_unregistered_items(company))}
+
+@frappe.whitelist()
+def get_goods_registration_report(job_id):
+    frappe.only_for(REGISTRATION_ROLES)
+    return get_report(REPORT_KEY, job_id)
+
+# ─────────────────────────────────────────────────────
+# Collect
+# ─────────────────────────────────────────────────────
+def _first_column(doctype, candidates):
+    return next((c for c in candidates if frappe.db.has_column(doctype, c)), None)
+
+def get_unregistered_items(company):
+    """Enabled EFRIS Items of `company` with no EFRIS Goods mirror row - one query."""
+    commodity = _first_column("Item", COMMODITY_COLUMNS)
+    uom_code = _first_column("UOM", UOM_CODE_COLUMNS)
+    return frappe.db.sql(
+        f"""
+        SELECT i.name AS item_code, i.item_name, i.description, i.stock_uom,
+               {f"i.`{commodity}`" if commodity else "NULL"} AS commodity_code,
+               {f"u.`{uom_code}`" if uom_code else "NULL"} AS measure_unit,
+               (SELECT MAX(ip.price_list_rate) FROM `tabItem Price` ip
+                 WHERE ip.item_code = i.name AND ip.selling = 1) AS unit_price
+        FROM `tabItem` i
+        LEFT JOIN `tabUOM` u ON u.name = i.stock_uom
+        LEFT JOIN `tabEFRIS Goods` g ON g.company = %(company)s AND g.goods_code = i.name
+        WHERE i.efris_e_company = %(company)s
+          AND i.disabled = 0
+          AND g.name IS NULL
+        ORDER BY i.name
+        """,
+        {"company": company},
+        as_dict=True,
+    )
+
+def build_goods_record(item):
+    return {
+        "operationType": "101",     # add goods
+        "goodsName": (item.item_name or item.item_code)[:200],
+        "goodsCode": item.item_code,
+        "measureUnit": item.measure_unit or "",
+        "unitPrice": format_amount(flt(item.unit_price)),
+        "currency": DEFAULT_CURRENCY_CODE,
+        "commodityCategoryId": item.commodity_code or "",
+        "haveExciseTax": "102",
+        "description": (item.description or item.item_name or "")[:1024],
+        "stockPrewarning": "0",
+        "pieceMeasureUnit": "",
+        "havePieceUnit": "102",
+        "pieceUnitPrice": "",
+        "packageScaledValue": "",
+        "pieceScaledValue": "",
+        "exciseDutyCode": "",
+        "haveOtherUnit": "102",
+    }
+
+# ─────────────────────────────────────────────────────
+# Background job
+# ─────────────────────────────────────────────────────
+@bulk_lane()
+def register_goods(company, job_id=None, notify_user=None):
+    conf = frappe.conf
+    items = get_unregistered_items(company)
+    report = {item.item_code: {"item_code": item.item_code} for item in items}
+
+    # 1️⃣ Local checks - EFRIS rejects goods without a commodity category or measure unit
+    records = []
+    for item in items:
+        missing = [label for label, value in (("commodity code", item.commodity_code), ("EFRIS UOM code", item.measure_unit)) if not value]
+        if missing:
+            report[item.item_code].update(status="Skipped", error=f"Missing {', '.join(missing)}")
+        else:
+            records.append(build_goods_record(item))
+
+    # 2️⃣ T130 uploads in maximum-size chunks, concurrent but rate limited
+    chunks = [records[i:i + T130_CHUNK] for i in range(0, len(records), T130_CHUNK)]
+    uploads = run_concurrently(
+        lambda chunk: _upload_chunk(company, chunk),
+        chunks,
+        max_workers=cint(conf.get("efris_goods_upload_workers") or MAX_WORKERS),
+        rate_per_sec=cint(conf.get("efris_t130_rate_per_sec") or T130_RATE_PER_SEC),
+    )
+
+    registered = []
+    for chunk, failures, error in uploads:
+        for record in chunk:
+            code = record["goodsCode"]
+            if error is not None:
+                report[code].update(status="Failed", error=str(error))
+            elif code in failures:
+                report[code].update(status="Failed", error=failures[code])
+            else:
+                report[code].update(status="Registered")
+                registered.append(record)
+
+    # 3️⃣ Write back in bulk: registered goods go straight into the EFRIS Goods mirror
+    if registered:
+        upsert_goods(company, [{**r, "goodsCategoryId": r["commodityCategoryId"]} for r in registered])
+        frappe.db.commit()
+
+    result = {
+        "job_id": job_id,
+        "company": company,
+        "summary": {
+            status: sum(1 for r in report.values() if r.get("status") == status)
+            for status in ("Registered", "Failed", "Skipped")
+        },
+        "rows": list(report.values()),
+    }
+
+    store_report(REPORT_KEY, job_id, result, notify_user, "efris_goods_registration_done")
+
+    frappe.logger("yana_efris").info(f"EFRIS goods registration for {company} finished: {result['summary']}")
+    return result
+
+def _upload_chunk(company, chunk):
+    """One T130 call. EFRIS answers with the rejected goods only; returns {goodsCode: message}."""
+    success, response = efris_post(interfaceCode="T130", content=chunk, company_name=company)
+    if not success:
+        raise Exception(response)
+    return rejected_goods(response)
@@ -0,0 +1,55 @@
+import frappe
+from frappe import _
+
+# ─────────────────────────────────────────────────────
+# Background jobs with a per-run report (customer import, goods registration, ...)
+#
+#   enqueue_report_job -> job stores its result with store_report (Redis, REPORT_TTL)
+#   -> realtime event to the user who started it -> client fetches it with get_report
+# ─────────────────────────────────────────────────────
+REPORT_TTL = 24 * 60 * 60
+
+
+def enqueue_report_job(method, job_name, timeout=3600, **kwargs):
+    """Enqueue `method` on the long queue with a fresh job_id and the current user to notify; returns the job_id."""
+    job_id = frappe.generate_hash(length=10)
+    frappe.enqueue(
+        method=method,
+        queue="long",
+        timeout=timeout,
+        job_name=job_name,
+        job_id=job_id,
+        notify_user=frappe.session.user,
+        **kwargs,
+    )
+    return job_id
+
+
+def store_report(prefix, job_id, result, notify_user=None, event=None):
+    """Keep the job result for get_report and tell the user who started it (summary only)."""
+    if job_id:
+        frappe.cache().set_value(prefix + job_id, {**result, "owner": notify_user}, expires_in_sec=REPORT_TTL)
+    if notify_user and event:
+        frappe.publish_realtime(event, result["summary"] | {"job_id": job_id}, user=notify_user)
+
+
+def get_report(prefix, job_id):
+    """Stored result of a job - only for the user who started it and System Managers."""
+    report = frappe.cache().get_value(prefix + job_id)
+    if report and report.get("owner") != frappe.session.user and "System Manager" not in frappe.get_roles():
+        frappe.throw(_("Not permitted to read this report."), frappe.PermissionError)
+    return report
+
+
+# ─────────────────────────────────────────────────────
+# EFRIS goods responses (T130 goods upload, T131 stock maintain)
+# ─────────────────────────────────────────────────────
+def rejected_goods(response):
+    """T130 / T131 answer with the rejected goods only: {goodsCode: "returnCode: returnMessage"}."""
+    if isinstance(response, dict):
+        response = response.get("message") if isinstance(response.get("message"), list) else response.get("records") or []
+    return {
+        row["goodsCode"]: f"{row.get('returnCode')}: {row.get('returnMessage') or ''}".strip()
+        for row in response or []
+        if isinstance(row, dict) and row.get("goodsCode") and row.get("returnCode") not in (None, "", "00")
+    }
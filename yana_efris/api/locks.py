@@ -0,0 +1,144 @@
+import functools
+import inspect
+import json
+import pickle
+import time
+
+import frappe
+
+# ─────────────────────────────────────────────────────
+# Config
+# ─────────────────────────────────────────────────────
+KEY = "yana_efris:single_flight:"
+POLL_INTERVAL = 0.2
+MAX_REQUEST_WAIT = 20       # seconds a web request waits for another holder (stay well inside gunicorn's timeout)
+ERROR_TTL = 5               # long enough for waiters to pick up a failure, short enough to retry right away
+SHARED_MESSAGE = "An identical request was already in progress; showing its result."
+RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+
+# ─────────────────────────────────────────────────────
+# Key helpers
+# ─────────────────────────────────────────────────────
+def document_name(value):
+    """Name of a doc passed as name / JSON string / dict / Document (whitelisted methods get all of these)."""
+    if isinstance(value, str):
+        if value.lstrip().startswith("{"):
+            try:
+                return json.loads(value).get("name")
+            except ValueError:
+                return value
+        return value
+    if isinstance(value, dict):
+        return value.get("name")
+    return getattr(value, "name", None)
+
+# ─────────────────────────────────────────────────────
+# Single flight: one run per key across all workers, concurrent callers share its result
+# ─────────────────────────────────────────────────────
+def single_flight(name, key, lock_ttl=120, result_ttl=30, message=SHARED_MESSAGE):
+    """
+    Decorator: while a call for the same key is running anywhere on the site,
+    further calls wait for it and return its result (or raise its error) instead
+    of running again. A successful result stays memoized for `result_ttl` seconds,
+    so a double click right after completion doesn't resubmit either. `key`
+    gets the bound arguments and returns the lock key (falsy -> no locking).
+
+        @single_flight("generate_irn", lambda args: document_name(args["sales_invoice"]))
+        def generate_irn(sales_invoice): ...
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+        accepts_kwargs = any(p.kind == p.VAR_KEYWORD for p in signature.parameters.values())
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not accepts_kwargs:
+                # same argument filtering frappe applies to whitelisted methods
+                kwargs = {k: v for k, v in kwargs.items() if k in signature.parameters}
+            try:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                call_key = key(bound.arguments)
+            except Exception:
+                call_key = None
+            if not call_key:
+                return fn(*args, **kwargs)
+
+            base = f"{KEY}{frappe.local.site}:{name}:{call_key}"
+            try:
+                return _run_once(base, fn, args, kwargs, lock_ttl, result_ttl, message)
+            except _LockUnavailable:
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+class _LockUnavailable(Exception):
+    pass
+
+def _run_once(base, fn, args, kwargs, lock_ttl, result_ttl, message):
+    cache = frappe.cache()
+    lock_key, result_key = f"{base}:lock", f"{base}:result"
+    token = frappe.generate_hash(length=16)
+    max_wait = MAX_REQUEST_WAIT if getattr(frappe.local, "request", None) else lock_ttl
+    deadline = time.monotonic() + max_wait
+    waited = False
+
+    while True:
+        try:
+            memo = _read_memo(cache, result_key)
+            # fresh callers only reuse successes; callers that waited also get the holder's error
+            if memo and (memo.get("ok") or waited):
+                return _replay(memo, message)
+            acquired = cache.set(cache.make_key(lock_key), token, nx=True, ex=lock_ttl)
+        except Exception as e:
+            # Redis trouble must never block fiscalization
+            raise _LockUnavailable() from e
+
+        if acquired:
+            break
+
+        # someone else is running it - wait for their outcome
+        waited = True
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            memo = _read_memo(cache, result_key)
+            if memo:
+                return _replay(memo, message)
+            if not cache.exists(lock_key):
+                break   # holder died without a result - try to take over
+        else:
+            frappe.throw(frappe._("This document is still being processed by another request. Please try again shortly."))
+
+    try:
+        cache.delete_value(result_key)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            cache.set_value(
+                result_key,
+                {"ok": False, "error": str(e) or e.__class__.__name__, "title": getattr(e, "title", None)},
+                expires_in_sec=ERROR_TTL,
+            )
+            raise
+        if result is not None:
+            # None means "nothing useful" (e.g. a swallowed error) - let the next call run again
+            cache.set_value(result_key, {"ok": True, "result": result}, expires_in_sec=result_ttl)
+        return result
+    finally:
+        try:
+            cache.eval(RELEASE_SCRIPT, 1, cache.make_key(lock_key), token)
+        except Exception:
+            pass
+
+def _read_memo(cache, result_key):
+    """Straight from Redis - get_value() pins the first miss in frappe.local.cache for the whole request."""
+    value = cache.get(cache.make_key(result_key))
+    return pickle.loads(value) if value is not None else None
+
+def _replay(memo, message):
+    frappe.msgprint(frappe._(message), indicator="blue", alert=True)
+    if memo.get("ok"):
+        return memo.get("result")
+    frappe.throw(memo.get("error"), title=memo.get("title"))
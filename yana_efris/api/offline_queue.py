@@ -0,0 +1,321 @@
+import frappe
+from frappe.utils import cint, now_datetime
+
+from yana_efris.api.concurrency import RateLimiter
+from yana_efris.api.dispatch import bulk_lane, efris_post
+from yana_efris.api.serialization import dumps, loads
+
+# ─────────────────────────────────────────────────────
+# Config (site_config.json)
+#   efris_offline_mode:        0 = off (default), 1 = queue on outage, "force" = always queue
+#   efris_offline_replay_rate: queued invoices sent per minute per company (default 60)
+# ─────────────────────────────────────────────────────
+DEFAULT_REPLAY_RATE = 60
+REPLAY_CHUNK = 500          # entries per replay job run; job re-enqueues itself while work remains
+OUTAGE_MARKERS = (
+    "max retries exceeded",
+    "connection refused",
+    "connection aborted",
+    "connection reset",
+    "failed to establish a new connection",
+    "name or service not known",
+    "temporary failure in name resolution",
+    "timed out",
+    "timeout",
+    "502 bad gateway",
+    "503 service",
+    "504 gateway",
+)
+# outages after which EFRIS may still have processed the request (it was sent, the answer got lost)
+AMBIGUOUS_MARKERS = (
+    "read timed out",
+    "timed out",
+    "timeout",
+    "connection aborted",
+    "connection reset",
+    "502 bad gateway",
+    "504 gateway",
+)
+# ... unless the connection was never made
+NOT_SENT_MARKERS = (
+    "connection refused",
+    "failed to establish a new connection",
+    "name or service not known",
+    "temporary failure in name resolution",
+    "connecttimeout",
+    "connect timeout",
+)
+
+def offline_mode():
+    mode = frappe.conf.get("efris_offline_mode")
+    if isinstance(mode, str) and mode.lower() == "force":
+        return "force"
+    return "auto" if cint(mode) else None
+
+def is_outage(error):
+    """True for network/gateway failures (worth retrying later), False for EFRIS rejections."""
+    try:
+        import requests
+
+        if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return True
+    except ImportError:
+        pass
+    text = str(error or "").lower()
+    return any(marker in text for marker in OUTAGE_MARKERS)
+
+def is_ambiguous(error):
+    """Outage where the request may have reached EFRIS - resending blindly could fiscalize twice."""
+    try:
+        import requests
+
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return False
+        if isinstance(error, requests.exceptions.Timeout):
+            return True
+    except ImportError:
+        pass
+    text = str(error or "").lower()
+    if any(marker in text for marker in NOT_SENT_MARKERS):
+        return False
+    return any(marker in text for marker in AMBIGUOUS_MARKERS)
+
+def has_backlog(company):
+    return bool(frappe.db.exists("EFRIS Offline Queue", {"company": company, "status": ["in", ["Queued", "Processing"]]}))
+
+def should_queue(company):
+    """Queue instead of posting: forced offline mode, or keep per-company order behind an existing backlog."""
+    mode = offline_mode()
+    return mode == "force" or (mode is not None and has_backlog(company))
+
+# ─────────────────────────────────────────────────────
+# Enqueue
+# ─────────────────────────────────────────────────────
+def enqueue_payload(interface_code, content, company, reference_doctype=None, reference_name=None, error=None):
+    """Persist a fully built payload; returns the (False, response) pair generate_irn passes back."""
+    entry = frappe.get_doc({
+        "doctype": "EFRIS Offline Queue",
+        "company": company,
+        "interface_code": interface_code,
+        "reference_doctype": reference_doctype,
+        "reference_name": reference_name,
+        "status": "Queued",
+        "queued_on": now_datetime(),
+        "payload": dumps(content),
+        "last_error": str(error)[:1000] if error else None,
+        "needs_check": 1 if error is not None and is_ambiguous(error) else 0,
+    })
+    entry.insert(ignore_permissions=True)
+    frappe.db.commit()
+    return False, {"offline_queue": entry.name, "message": "EFRIS unreachable - invoice queued for submission."}
+
+def post_or_queue(make_post, interfaceCode, content, company_name, reference_doc_type=None, reference_document=None):
+    """make_post (or efris_post) with offline fallback. A queued result is (False, {"offline_queue": name, ...})."""
+    if should_queue(company_name):
+        return enqueue_payload(interfaceCode, content, company_name, reference_doc_type, reference_document)
+
+    try:
+        status, response = make_post(
+            interfaceCode=interfaceCode,
+            content=content,
+            company_name=company_name,
+            reference_doc_type=reference_doc_type,
+            reference_document=reference_document,
+        )
+    except Exception as e:
+        if offline_mode() and is_outage(e):
+            return enqueue_payload(interfaceCode, content, company_name, reference_doc_type, reference_document, e)
+        raise
+
+    if not status and offline_mode() and is_outage(response):
+        return enqueue_payload(interfaceCode, content, company_name, reference_doc_type, reference_document, response)
+    return status, response
+
+def is_queued(response):
+    return isinstance(response, dict) and bool(response.get("offline_queue"))
+
+# ─────────────────────────────────────────────────────
+# Replay worker
+# ─────────────────────────────────────────────────────
+def replay_offline_queue():
+    """Scheduler (every minute): start one replay job per company with queued entries."""
+    companies = frappe.get_all(
+        "EFRIS Offline Queue",
+        filters={"status": "Queued"},
+        pluck="company",
+        distinct=True,
+    )
+    for company in companies:
+        enqueue_company_replay(company)
+
+def enqueue_company_replay(company):
+    frappe.enqueue(
+        "yana_efris.api.offline_queue.replay_company_queue",
+        queue="long",
+        timeout=3600,
+        job_id=f"efris_offline_replay::{company}",
+        deduplicate=True,
+        company=company,
+    )
+
+@bulk_lane()
+def replay_company_queue(company):
+    """Drain queued entries for one company in creation order at the configured rate."""
+    rate_per_min = cint(frappe.conf.get("efris_offline_replay_rate")) or DEFAULT_REPLAY_RATE
+    limiter = RateLimiter(rate_per_min / 60.0, burst=1)
+
+    # entries left in Processing by a killed worker go back to the front of the line -
+    # the post may have gone through, so they are checked against EFRIS first
+    frappe.db.set_value(
+        "EFRIS Offline Queue", {"company": company, "status": "Processing"}, {"status": "Queued", "needs_check": 1},
+        update_modified=False,
+    )
+
+    entries = frappe.get_all(
+        "EFRIS Offline Queue",
+        filters={"company": company, "status": "Queued"},
+        fields=["name", "interface_code", "reference_doctype", "reference_name", "payload", "attempts", "needs_check"],
+        order_by="creation asc",
+        limit_page_length=REPLAY_CHUNK,
+    )
+
+    sent = failed = review = 0
+    stopped = False
+    for entry in entries:
+        limiter.acquire()
+        payload = loads(entry.payload)
+
+        if entry.needs_check:
+            try:
+                verdict = _check_before_resend(company, entry, payload)
+            except Exception as e:
+                if is_outage(e):
+                    _update_entry(entry, "Queued", error=e, needs_check=1)
+                    frappe.db.commit()
+                    stopped = True
+                    break
+                verdict = f"Could not check EFRIS before resending: {e}"
+            if verdict:
+                _update_entry(entry, "Review", error=verdict)
+                frappe.db.commit()
+                _publish(entry, "Review")
+                review += 1
+                continue
+
+        frappe.db.set_value("EFRIS Offline Queue", entry.name, "status", "Processing", update_modified=False)
+        frappe.db.commit()
+
+        try:
+            status, response = efris_post(
+                interfaceCode=entry.interface_code,
+                content=payload,
+                company_name=company,
+                reference_doc_type=entry.reference_doctype,
+                reference_document=entry.reference_name,
+            )
+        except Exception as e:
+            status, response = False, e
+
+        if not status and is_outage(response):
+            # still offline - put it back and stop; order is preserved for the next run
+            _update_entry(entry, "Queued", error=response, needs_check=1 if is_ambiguous(response) else entry.needs_check)
+            frappe.db.commit()
+            stopped = True
+            break
+
+        if status:
+            try:
+                _handle_success(entry, response)
+                _update_entry(entry, "Sent", response=response)
+                result = "Sent"
+            except Exception:
+                # accepted by EFRIS - never resend; the FDN still has to be recorded by hand
+                frappe.db.rollback()
+                frappe.log_error(frappe.get_traceback(), f"EFRIS offline replay: FDN not recorded for {entry.reference_name}")
+                _update_entry(entry, "Review", response=response, error=frappe.get_traceback())
+                result = "Review"
+            sent += 1
+        else:
+            _update_entry(entry, "Failed", error=response)
+            result = "Failed"
+            failed += 1
+        frappe.db.commit()
+        _publish(entry, result)
+
+    if entries:
+        frappe.logger("yana_efris").info(f"EFRIS offline replay for {company}: sent={sent} failed={failed} review={review}")
+
+    if len(entries) == REPLAY_CHUNK and not stopped:
+        enqueue_company_replay(company)
+
+def _check_before_resend(company, entry, payload):
+    """
+    For entries whose last attempt may have reached EFRIS: None when it is safe
+    to post again, otherwise the reason it needs a manual look (status Review).
+    """
+    reference = ((payload.get("sellerDetails") or {}).get("referenceNo") or "").strip()
+    if entry.interface_code != "T109" or not reference:
+        return "Last attempt may have reached EFRIS and it can't be looked up by referenceNo - verify before retrying."
+
+    success, response = efris_post(
+        interfaceCode="T106",
+        content={"referenceNo": reference, "pageNo": "1", "pageSize": "10"},
+        company_name=company,
+    )
+    if not success:
+        if is_outage(response):
+            raise Exception(response)
+        return f"Could not check EFRIS for referenceNo {reference}: {response}"
+
+    msg = response["message"] if isinstance(response, dict) and isinstance(response.get("message"), dict) else response or {}
+    fdns = [r.get("invoiceNo") for r in msg.get("records") or [] if r.get("referenceNo") == reference]
+    if fdns:
+        return f"EFRIS already has referenceNo {reference} as FDN {', '.join(fdns)} - record it on the E Invoice instead of resending."
+    return None
+
+def _handle_success(entry, response):
+    if entry.interface_code == "T109" and entry.reference_doctype == "Sales Invoice":
+        from uganda_compliance.efris.api_classes.e_invoice import EInvoiceAPI
+
+        # E Invoices are named independently; the Sales Invoice links to its own
+        einvoice_name = frappe.db.get_value("Sales Invoice", entry.reference_name, "efris_e_invoice")
+        if not einvoice_name:
+            raise frappe.DoesNotExistError(f"Sales Invoice {entry.reference_name} has no linked E Invoice")
+        einvoice = frappe.get_doc("E Invoice", einvoice_name)
+        EInvoiceAPI.handle_successful_irn_generation(einvoice, response)
+
+def _publish(entry, status):
+    frappe.publish_realtime(
+        "efris_offline_queue_update",
+        {"reference_doctype": entry.reference_doctype, "reference_name": entry.reference_name, "status": status},
+        doctype=entry.reference_doctype,
+        docname=entry.reference_name,
+    )
+
+def _update_entry(entry, status, response=None, error=None, needs_check=0):
+    values = {
+        "status": status,
+        "attempts": cint(entry.attempts) + 1,
+        "processed_on": now_datetime(),
+        "needs_check": needs_check,
+    }
+    if response is not None:
+        values["response"] = dumps(response)
+    if error is not None:
+        values["last_error"] = str(error)[:1000]
+    frappe.db.set_value("EFRIS Offline Queue", entry.name, values, update_modified=False)
+
+@frappe.whitelist()
+def retry_failed(company=None):
+    """Put Failed entries back in the queue (e.g. after fixing master data)."""
+    frappe.only_for("System Manager")
+    filters = {"status": "Failed"}
+    if company:
+        filters["company"] = company
+    entries = frappe.get_all("EFRIS Offline Queue", filters=filters, fields=["name", "company"])
+    for entry in entries:
+        frappe.db.set_value("EFRIS Offline Queue", entry.name, "status", "Queued", update_modified=False)
+    frappe.db.commit()
+    for c in {entry.company for entry in entries}:
+        enqueue_company_replay(c)
+    return len(entries)
@@ -0,0 +1,120 @@
+import frappe
+from frappe.utils import cint, flt
+
+from yana_efris.yana_efris.doctype.efris_goods.efris_goods import get_registered_goods_codes
+
+# ─────────────────────────────────────────────────────
+# Config (site_config.json)
+#   efris_preflight: 0 disables the local T109 check (default on)
+# ─────────────────────────────────────────────────────
+ROUNDING = 0.01             # per line / per tax category
+DUMMY_EMAILS = {"info@test.com"}
+
+REQUIRED = {
+    "sellerDetails": ("tin", "legalName", "emailAddress"),
+    "basicInformation": ("deviceNo", "issuedDate", "currency", "invoiceType"),
+    "buyerDetails": ("buyerType",),
+    "summary": ("netAmount", "taxAmount", "grossAmount", "itemCount"),
+}
+REQUIRED_GOODS = ("item", "itemCode", "qty", "unitOfMeasure", "unitPrice", "total", "taxRate", "tax", "orderNumber")
+REQUIRED_TAX = ("taxCategoryCode", "netAmount", "taxRate", "taxAmount", "grossAmount")
+# not confirmed as EFRIS rejections - reported as warnings so accepted invoices aren't blocked
+EXPECTED = {
+    "sellerDetails": ("branchId",),
+    "basicInformation": ("operator", "invoiceKind"),
+}
+
+
+def preflight_enabled():
+    return cint(frappe.conf.get("efris_preflight", 1))
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _sum(rows, field):
+    return sum(flt(row.get(field)) for row in rows)
+
+
+def validate_t109(einvoice_json, company=None):
+    """
+    Local T109 checks run before anything is encrypted or posted.
+    Returns (errors, warnings); any error means EFRIS would reject the invoice.
+    """
+    errors, warnings = [], []
+
+    # 1️⃣ Schema: sections and required fields
+    for section, fields in REQUIRED.items():
+        data = einvoice_json.get(section)
+        if not isinstance(data, dict):
+            errors.append(f"{section} is missing")
+            continue
+        missing = [f for f in fields if _blank(data.get(f))]
+        if missing:
+            errors.append(f"{section}: missing {', '.join(missing)}")
+    for section, fields in EXPECTED.items():
+        data = einvoice_json.get(section)
+        missing = [f for f in fields if _blank(data.get(f))] if isinstance(data, dict) else []
+        if missing:
+            warnings.append(f"{section}: missing {', '.join(missing)}")
+
+    goods = einvoice_json.get("goodsDetails")
+    taxes = einvoice_json.get("taxDetails")
+    if not isinstance(goods, list) or not goods:
+        errors.append("goodsDetails is empty")
+        goods = []
+    if not isinstance(taxes, list) or not taxes:
+        errors.append("taxDetails is empty")
+        taxes = []
+
+    for index, row in enumerate(goods, 1):
+        missing = [f for f in REQUIRED_GOODS if _blank(row.get(f))]
+        if missing:
+            errors.append(f"goodsDetails row {index} ({row.get('itemCode') or '?'}): missing {', '.join(missing)}")
+    for index, row in enumerate(taxes, 1):
+        missing = [f for f in REQUIRED_TAX if _blank(row.get(f))]
+        if missing:
+            errors.append(f"taxDetails row {index}: missing {', '.join(missing)}")
+
+    # 2️⃣ Seller identity fallbacks (accepted by EFRIS, but wrong on the fiscal document)
+    seller = einvoice_json.get("sellerDetails") or {}
+    if (seller.get("emailAddress") or "").strip().lower() in DUMMY_EMAILS:
+        warnings.append(f"sellerDetails.emailAddress is the placeholder {seller.get('emailAddress')} - set the company email")
+
+    # 3️⃣ Arithmetic: goods tax == taxDetails tax == summary tax (within rounding)
+    summary = einvoice_json.get("summary") or {}
+    if goods and taxes and isinstance(summary, dict):
+        goods_tax = _sum(goods, "tax")
+        details_tax = _sum(taxes, "taxAmount")
+        summary_tax = flt(summary.get("taxAmount"))
+
+        if abs(goods_tax - details_tax) > ROUNDING * len(goods):
+            errors.append(f"tax mismatch: goodsDetails {goods_tax:.2f} vs taxDetails {details_tax:.2f}")
+        if abs(details_tax - summary_tax) > ROUNDING * len(taxes):
+            errors.append(f"tax mismatch: taxDetails {details_tax:.2f} vs summary {summary_tax:.2f}")
+
+        net, gross = flt(summary.get("netAmount")), flt(summary.get("grossAmount"))
+        if abs(net + summary_tax - gross) > ROUNDING:
+            errors.append(f"summary: netAmount {net:.2f} + taxAmount {summary_tax:.2f} != grossAmount {gross:.2f}")
+
+        for index, row in enumerate(taxes, 1):
+            row_net, row_tax, row_gross = flt(row.get("netAmount")), flt(row.get("taxAmount")), flt(row.get("grossAmount"))
+            if abs(row_net + row_tax - row_gross) > ROUNDING:
+                errors.append(f"taxDetails row {index}: netAmount + taxAmount != grossAmount")
+
+        if cint(summary.get("itemCount")) and cint(summary.get("itemCount")) != len(goods):
+            warnings.append(f"summary.itemCount {summary.get('itemCount')} != {len(goods)} goodsDetails rows")
+
+    # 4️⃣ Local EFRIS Goods mirror (only meaningful once the company's catalog has been synced)
+    if company and goods and frappe.db.exists("EFRIS Goods", {"company": company}):
+        codes = {row.get("itemCode") for row in goods if row.get("itemCode")}
+        unregistered = codes - get_registered_goods_codes(company, codes)
+        if unregistered:
+            warnings.append(f"goods not in local EFRIS mirror: {', '.join(sorted(unregistered))}")
+
+    return errors, warnings
+
+
+def format_errors(errors):
+    return "EFRIS pre-flight check failed:<br>" + "<br>".join(f"• {frappe.utils.escape_html(e)}" for e in errors)
@@ -0,0 +1,109 @@
+import cProfile
+import io
+import pstats
+import time
+from contextlib import contextmanager
+
+import frappe
+from frappe.utils import cint
+
+# ─────────────────────────────────────────────────────
+# Config
+#   request flag:  efris_profile=1 (cProfile) | efris_profile=pyinstrument  (System Manager only)
+#   site_config:   efris_profile_invoices: [<Sales Invoice>, ...] - profile these even from jobs/scheduler
+# ─────────────────────────────────────────────────────
+PROFILE_TOP = 40            # rows of cProfile stats kept in the log
+
+
+# ─────────────────────────────────────────────────────
+# Query counting (also used by yana_efris.benchmarks)
+# ─────────────────────────────────────────────────────
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+@contextmanager
+def count_queries():
+    """Count frappe.db.sql calls (and time spent in them) inside the block."""
+    counter = QueryCounter()
+    original_sql = frappe.db.sql
+
+    def counting_sql(*args, **kwargs):
+        counter.count += 1
+        start = time.perf_counter()
+        try:
+            return original_sql(*args, **kwargs)
+        finally:
+            counter.seconds += time.perf_counter() - start
+
+    frappe.db.sql = counting_sql
+    try:
+        yield counter
+    finally:
+        frappe.db.sql = original_sql
+
+
+# ─────────────────────────────────────────────────────
+# On-demand profiling of a single fiscalization
+# ─────────────────────────────────────────────────────
+def requested_profiler(reference_name=None):
+    """None, "cprofile" or "pyinstrument" for the current request / invoice."""
+    if reference_name and reference_name in (frappe.conf.get("efris_profile_invoices") or []):
+        return "cprofile"
+
+    form_dict = getattr(frappe.local, "form_dict", None) or {}
+    flag = form_dict.get("efris_profile")
+    if not flag or "System Manager" not in frappe.get_roles():
+        return None
+    if str(flag).lower() == "pyinstrument":
+        return "pyinstrument"
+    return "cprofile" if cint(flag) else None
+
+
+@contextmanager
+def profile_invoice(reference_name):
+    """
+    Profile the block when requested and store the report as an Error Log
+    titled "EFRIS PROFILE <name>" (with query count and wall time).
+    """
+    profiler_name = requested_profiler(reference_name)
+    if not profiler_name:
+        yield
+        return
+
+    if profiler_name == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            profiler_name = "cprofile"
+
+    if profiler_name == "pyinstrument":
+        profiler = Profiler()
+        start_profiler, stop_profiler = profiler.start, profiler.stop
+    else:
+        profiler = cProfile.Profile()
+        start_profiler, stop_profiler = profiler.enable, profiler.disable
+
+    start = time.perf_counter()
+    with count_queries() as queries:
+        start_profiler()
+        try:
+            yield
+        finally:
+            stop_profiler()
+            elapsed = time.perf_counter() - start
+            _save_report(reference_name, profiler_name, profiler, elapsed, queries)
+
+
+def _save_report(reference_name, profiler_name, profiler, elapsed, queries):
+    if profiler_name == "pyinstrument":
+        body = profiler.output_text(unicode=True, color=False)
+    else:
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP)
+        body = out.getvalue()
+
+    header = f"{profiler_name}: {elapsed * 1000:.1f} ms wall, {queries.count} queries ({queries.seconds * 1000:.1f} ms in SQL)\n\n"
+    frappe.log_error(header + body, f"EFRIS PROFILE {reference_name}")
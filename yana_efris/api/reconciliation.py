@@ -0,0 +1,236 @@
+import csv
+from datetime import datetime
+
+import frappe
+from frappe.utils import add_days, cint, flt, getdate, now_datetime
+
+from yana_efris.api.dispatch import bulk_lane, efris_post
+
+# ─────────────────────────────────────────────────────
+# Config
+# ─────────────────────────────────────────────────────
+EFRIS_PAGE_SIZE = 100       # T106 max page size
+LOCAL_CHUNK = 1000          # local invoices compared per query
+AMOUNT_TOLERANCE = 1.0      # UGX rounding slack between local grand_total and EFRIS grossAmount
+GRACE_DAYS = 3              # efris_reconciliation_grace_days: fiscalized days before/after the posting date
+SEEN_TTL = 6 * 60 * 60
+SEEN_KEY = "yana_efris:reconciliation_seen:"
+REPORT_COLUMNS = ["issue", "sales_invoice", "fdn", "local_amount", "efris_amount", "efris_issued_date", "detail"]
+
+# ─────────────────────────────────────────────────────
+# Public entrypoint
+# ─────────────────────────────────────────────────────
+@frappe.whitelist()
+def enqueue_efris_reconciliation(company, from_date, to_date):
+    frappe.only_for(["System Manager", "Accounts Manager"])
+    job_id = frappe.generate_hash(length=10)
+    frappe.enqueue(
+        method="yana_efris.api.reconciliation.reconcile_invoices",
+        queue="long",
+        timeout=4 * 60 * 60,
+        job_name=f"EFRIS Reconciliation ({company} {from_date}..{to_date})",
+        company=company,
+        from_date=from_date,
+        to_date=to_date,
+        job_id=job_id,
+        notify_user=frappe.session.user,
+    )
+    return {"job_id": job_id}
+
+# ─────────────────────────────────────────────────────
+# Job
+# ─────────────────────────────────────────────────────
+@bulk_lane()
+def reconcile_invoices(company, from_date, to_date, job_id=None, notify_user=None):
+    """
+    Compare URA records (T106 pages) with local Sales Invoices for a date range.
+    Memory stays bounded: one EFRIS page / one local chunk is hash-joined at a time,
+    seen FDNs live in a Redis set, and mismatches are streamed to a CSV file.
+    """
+    job_id = job_id or frappe.generate_hash(length=10)
+    seen_key = SEEN_KEY + job_id
+    file_name = f"efris_reconciliation_{company}_{from_date}_{to_date}_{job_id}.csv".replace(" ", "_").replace("/", "-")
+    path = frappe.get_site_path("private", "files", file_name)
+    counts = {"efris_records": 0, "local_invoices": 0}
+
+    with open(path, "w", newline="") as fh:
+        writer = csv.DictWriter(fh, fieldnames=REPORT_COLUMNS)
+        writer.writeheader()
+
+        def report(issue, **row):
+            counts[issue] = counts.get(issue, 0) + 1
+            writer.writerow({"issue": issue, **row})
+
+        # 1️⃣ URA side: stream T106 pages, join each page against local invoices.
+        # T106 filters on the EFRIS issued date, the local side on posting_date - the URA
+        # window is padded so invoices fiscalized a few days off their posting date are
+        # still seen; only records issued inside the range are reported on.
+        grace = cint(frappe.conf.get("efris_reconciliation_grace_days") or GRACE_DAYS)
+        in_range = (getdate(from_date), getdate(to_date))
+        for records in iter_efris_invoices(company, add_days(from_date, -grace), add_days(to_date, grace)):
+            counts["efris_records"] += len(records)
+            _compare_efris_page(records, seen_key, report, in_range)
+
+        # 2️⃣ Local side: stream submitted invoices, anything fiscalized but unseen at URA is a gap
+        for chunk in iter_local_invoices(company, from_date, to_date):
+            counts["local_invoices"] += len(chunk)
+            _compare_local_chunk(chunk, seen_key, report)
+
+    frappe.cache().delete_value(seen_key)
+
+    file_doc = frappe.get_doc({
+        "doctype": "File",
+        "file_name": file_name,
+        "file_url": f"/private/files/{file_name}",
+        "is_private": 1,
+    }).insert(ignore_permissions=True)
+    frappe.db.commit()
+
+    summary = {"job_id": job_id, "company": company, "from_date": str(from_date), "to_date": str(to_date),
+               "counts": counts, "report": file_doc.file_url, "finished_on": str(now_datetime())}
+    if notify_user:
+        frappe.publish_realtime("efris_reconciliation_done", summary, user=notify_user)
+    frappe.logger("yana_efris").info(f"EFRIS reconciliation finished: {summary}")
+    return summary
+
+# ─────────────────────────────────────────────────────
+# Streams
+# ─────────────────────────────────────────────────────
+def iter_efris_invoices(company, from_date, to_date, page_size=EFRIS_PAGE_SIZE):
+    """Yield T106 record pages for the range; only one page is held at a time."""
+    page_no = 1
+    while True:
+        success, response = efris_post(
+            interfaceCode="T106",
+            content={
+                "startDate": str(getdate(from_date)),
+                "endDate": str(getdate(to_date)),
+                "pageNo": str(page_no),
+                "pageSize": str(page_size),
+            },
+            company_name=company,
+        )
+        if not success:
+            frappe.throw(f"EFRIS T106 query failed on page {page_no}: {response}")
+
+        # same two response shapes as T127 (see efris_item_sync.fetch_efris_items_page)
+        if isinstance(response, dict) and isinstance(response.get("message"), dict):
+            msg = response["message"]
+        else:
+            msg = response or {}
+        records = msg.get("records") or []
+        if not records:
+            return
+        yield records
+
+        page_count = cint((msg.get("page") or {}).get("pageCount"))
+        if (page_count and page_no >= page_count) or len(records) < page_size:
+            return
+        page_no += 1
+
+def iter_local_invoices(company, from_date, to_date, chunk_size=LOCAL_CHUNK):
+    """Keyset-paginated submitted Sales Invoices (name > last name) - no OFFSET scans."""
+    last_name = ""
+    while True:
+        chunk = frappe.db.sql(
+            """
+            SELECT name, efris_irn, grand_total, posting_date, is_return
+            FROM `tabSales Invoice`
+            WHERE company = %(company)s
+              AND docstatus = 1
+              AND posting_date BETWEEN %(from_date)s AND %(to_date)s
+              AND name > %(last_name)s
+            ORDER BY name
+            LIMIT %(limit)s
+            """,
+            {"company": company, "from_date": from_date, "to_date": to_date, "last_name": last_name, "limit": chunk_size},
+            as_dict=True,
+        )
+        if not chunk:
+            return
+        yield chunk
+        last_name = chunk[-1].name
+
+# ─────────────────────────────────────────────────────
+# Hash joins
+# ─────────────────────────────────────────────────────
+def _issued_date(record):
+    """EFRIS issuedDate ("dd/mm/yyyy hh:mm:ss", some sandboxes ISO) as a date, None if unparseable."""
+    value = (record.get("issuedDate") or "")[:10]
+    for fmt in ("%d/%m/%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+def _compare_efris_page(records, seen_key, report, in_range=None):
+    by_fdn = {r.get("invoiceNo"): r for r in records if r.get("invoiceNo")}
+    if by_fdn:
+        frappe.cache().sadd(seen_key, *by_fdn)
+        frappe.cache().expire(frappe.cache().make_key(seen_key), SEEN_TTL)
+
+    # two IN lookups (efris_irn index, primary key) - an OR across both columns can't use either
+    fields = ["name", "efris_irn", "grand_total", "docstatus"]
+    local = {}
+    if by_fdn:
+        for row in frappe.get_all("Sales Invoice", filters={"efris_irn": ["in", list(by_fdn)]}, fields=fields):
+            local[row.efris_irn] = row
+            local[f"ref:{row.name}"] = row
+
+    refs = {
+        r.get("referenceNo") for r in records
+        if r.get("referenceNo") and r.get("invoiceNo") not in local and f"ref:{r.get('referenceNo')}" not in local
+    }
+    if refs:
+        for row in frappe.get_all("Sales Invoice", filters={"name": ["in", list(refs)]}, fields=fields):
+            local.setdefault(f"ref:{row.name}", row)
+
+    for record in records:
+        issued = _issued_date(record)
+        if in_range and issued and not in_range[0] <= issued <= in_range[1]:
+            continue    # grace window: only marks the FDN as seen
+        fdn = record.get("invoiceNo")
+        row = local.get(fdn) or local.get(f"ref:{record.get('referenceNo')}")
+        efris_amount = flt(record.get("grossAmount"))
+        base = {"fdn": fdn, "efris_amount": efris_amount, "efris_issued_date": record.get("issuedDate")}
+
+        if not row:
+            report("Missing Locally", detail=f"referenceNo={record.get('referenceNo')}", **base)
+        elif row.efris_irn != fdn:
+            report("FDN Mismatch", sales_invoice=row.name, local_amount=row.grand_total,
+                   detail=f"local efris_irn={row.efris_irn}", **base)
+        elif row.docstatus != 1:
+            report("Not Submitted Locally", sales_invoice=row.name, local_amount=row.grand_total,
+                   detail=f"docstatus={row.docstatus}", **base)
+        elif abs(abs(flt(row.grand_total)) - abs(efris_amount)) > AMOUNT_TOLERANCE:
+            report("Amount Mismatch", sales_invoice=row.name, local_amount=row.grand_total, **base)
+
+def _compare_local_chunk(chunk, seen_key, report):
+    fiscalized = [row for row in chunk if row.efris_irn]
+    for row in chunk:
+        if not row.efris_irn:
+            report("Not Fiscalized", sales_invoice=row.name, local_amount=row.grand_total)
+
+    if not fiscalized:
+        return
+
+    cache = frappe.cache()
+    pipe = cache.pipeline()
+    for row in fiscalized:
+        pipe.sismember(cache.make_key(seen_key), row.efris_irn)
+    for row, seen in zip(fiscalized, pipe.execute(), strict=True):
+        if not seen:
+            report("Missing at URA", sales_invoice=row.name, fdn=row.efris_irn, local_amount=row.grand_total)
+
+@frappe.whitelist()
+def get_reconciliation_files(company=None, limit=20):
+    """Latest reconciliation CSVs (File records) for the report list."""
+    frappe.only_for(["System Manager", "Accounts Manager"])
+    filters = {"file_name": ["like", "efris_reconciliation_%"]}
+    if company:
+        filters["file_name"] = ["like", f"efris_reconciliation_{company.replace(' ', '_')}_%"]
+    return frappe.get_all(
+        "File", filters=filters, fields=["name", "file_name", "file_url", "creation"],
+        order_by="creation desc", limit_page_length=cint(limit) or 20,
+    )
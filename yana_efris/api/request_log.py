@@ -0,0 +1,226 @@
+import base64
+import inspect
+import zlib
+
+import frappe
+from frappe.utils import add_days, cint, get_datetime, now_datetime
+
+from yana_efris.api.serialization import dumps, loads
+
+# ─────────────────────────────────────────────────────
+# Config (site_config.json)
+#   efris_request_log_mode:           "sync" (default, uganda_compliance behaviour) | "async"
+#   efris_request_log_retention_days: purge EFRIS Request Log / E Invoice Request Log older than this;
+#                                     unset = never purge (those rows are the fiscal audit trail)
+#
+# async mode keeps entries in the Redis cache (frappe.cache()) until the next flush
+# (every minute, earlier past FLUSH_THRESHOLD). That Redis is evictable and usually
+# not persisted: an eviction or restart in between loses those entries without a
+# trace. Use it only where the log is diagnostic, not where it is kept for audit.
+# ─────────────────────────────────────────────────────
+BUFFER_KEY = "yana_efris:request_log_buffer"
+FLUSH_LOCK_KEY = "yana_efris:request_log_flush_lock"
+FLUSH_LOCK_TTL = 120        # seconds; renewed after every batch
+FLUSH_BATCH = 500           # rows per bulk insert
+FLUSH_THRESHOLD = 200       # buffered entries that trigger an early flush job
+PURGE_BATCH = 5000          # rows deleted per statement/commit
+
+# argument names used by uganda_compliance's log_request_to_efris -> indexed columns
+COLUMN_ARGS = {
+    "interface_code": ("interfaceCode", "interface_code"),
+    "reference_doctype": ("reference_doc_type", "reference_doctype"),
+    "reference_document": ("reference_document", "reference_name", "reference_docname"),
+    "company": ("company_name", "company"),
+    "status": ("status", "request_status"),
+}
+
+
+def _original():
+    from uganda_compliance.efris.doctype.e_invoice_request_log.e_invoice_request_log import (
+        log_request_to_efris,
+    )
+
+    return log_request_to_efris
+
+
+def log_mode():
+    return (frappe.conf.get("efris_request_log_mode") or "sync").lower()
+
+
+# ─────────────────────────────────────────────────────
+# Compression helpers
+# ─────────────────────────────────────────────────────
+def compress(obj):
+    raw = dumps(obj).encode("utf-8")
+    packed = zlib.compress(raw, 6)
+    return base64.b64encode(packed).decode("ascii"), len(raw), len(packed)
+
+
+def decompress(data):
+    return loads(zlib.decompress(base64.b64decode(data)))
+
+
+# ─────────────────────────────────────────────────────
+# Patched entry point (see yana_efris.overrides.patching)
+# ─────────────────────────────────────────────────────
+def log_request_to_efris(*args, **kwargs):
+    """
+    Replacement for uganda_compliance's log_request_to_efris used by make_post.
+    sync mode: unchanged. async mode: push a compressed entry to Redis and return immediately
+    (best effort - see the config notes above).
+    """
+    original = _original()
+    if log_mode() != "async":
+        return original(*args, **kwargs)
+
+    try:
+        bound = inspect.signature(original).bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = dict(bound.arguments)
+    except TypeError:
+        arguments = {"args": list(args), **kwargs}
+
+    columns = {}
+    for column, names in COLUMN_ARGS.items():
+        for name in names:
+            if name in arguments and isinstance(arguments[name], (str, int)) and column not in columns:
+                columns[column] = str(arguments.pop(name))
+
+    try:
+        data, original_size, compressed_size = compress(arguments)
+    except TypeError:
+        # e.g. a raw requests.Response - keep its text form
+        data, original_size, compressed_size = compress(
+            {k: v if isinstance(v, (dict, list, str, int, float, type(None))) else str(v) for k, v in arguments.items()}
+        )
+    entry = dumps({
+        "logged_at": str(now_datetime()),
+        "user": frappe.session.user if getattr(frappe.local, "session", None) else "Administrator",
+        "columns": columns,
+        "data": data,
+        "original_size": original_size,
+        "compressed_size": compressed_size,
+    })
+
+    try:
+        frappe.cache().rpush(BUFFER_KEY, entry)
+        if frappe.cache().llen(BUFFER_KEY) >= FLUSH_THRESHOLD:
+            enqueue_flush()
+    except Exception:
+        # Redis trouble must never fail an invoice - fall back to the synchronous write
+        return original(*args, **kwargs)
+
+
+def enqueue_flush():
+    frappe.enqueue(
+        "yana_efris.api.request_log.flush_request_log_buffer",
+        queue="short",
+        job_id="efris_request_log_flush",
+        deduplicate=True,
+    )
+
+
+# ─────────────────────────────────────────────────────
+# Background jobs
+# ─────────────────────────────────────────────────────
+def flush_request_log_buffer():
+    """
+    Scheduler (every minute) / threshold job: move buffered entries into EFRIS Request Log.
+    Both paths share one Redis lock - two flushers would insert the same head
+    of the list twice and then trim away entries nobody wrote.
+    """
+    cache = frappe.cache()
+    lock = cache.lock(cache.make_key(FLUSH_LOCK_KEY), timeout=FLUSH_LOCK_TTL)
+    if not lock.acquire(blocking=False):
+        return 0
+    try:
+        return _flush(cache, lock)
+    finally:
+        try:
+            lock.release()
+        except Exception:
+            pass   # expired: the next flush simply takes over
+
+
+def _flush(cache, lock):
+    total = 0
+    while True:
+        raw_entries = cache.lrange(BUFFER_KEY, 0, FLUSH_BATCH - 1)
+        if not raw_entries:
+            break
+
+        values = []
+        for raw in raw_entries:
+            try:
+                entry = loads(raw)
+            except Exception:
+                continue
+            columns = entry.get("columns") or {}
+            logged_at = get_datetime(entry.get("logged_at"))
+            values.append((
+                frappe.generate_hash(length=12), logged_at, logged_at, entry.get("user"), entry.get("user"),
+                columns.get("interface_code"), columns.get("company"), columns.get("status"),
+                columns.get("reference_doctype"), columns.get("reference_document"),
+                cint(entry.get("original_size")), cint(entry.get("compressed_size")), entry.get("data"),
+            ))
+
+        if values:
+            frappe.db.bulk_insert(
+                "EFRIS Request Log",
+                fields=[
+                    "name", "creation", "modified", "owner", "modified_by",
+                    "interface_code", "company", "status", "reference_doctype", "reference_document",
+                    "original_size", "compressed_size", "data",
+                ],
+                values=values,
+            )
+        frappe.db.commit()
+        # drop only what we inserted; producers keep appending at the tail
+        cache.ltrim(BUFFER_KEY, len(raw_entries), -1)
+        total += len(values)
+        lock.reacquire()
+
+    return total
+
+
+def purge_request_logs():
+    """
+    Daily: delete logs past the retention period in bounded batches (short locks, small binlog).
+    Opt-in - nothing is deleted unless efris_request_log_retention_days is set.
+    """
+    days = cint(frappe.conf.get("efris_request_log_retention_days"))
+    if days <= 0:
+        return {}
+    cutoff = add_days(now_datetime(), -days)
+    deleted = {}
+
+    for doctype in ("EFRIS Request Log", "E Invoice Request Log"):
+        if not frappe.db.table_exists(doctype):
+            continue
+        deleted[doctype] = 0
+        while True:
+            names = frappe.get_all(
+                doctype,
+                filters={"creation": ["<", cutoff]},
+                pluck="name",
+                order_by="creation asc",
+                limit_page_length=PURGE_BATCH,
+            )
+            if not names:
+                break
+            frappe.db.delete(doctype, {"name": ["in", names]})
+            frappe.db.commit()
+            deleted[doctype] += len(names)
+            if len(names) < PURGE_BATCH:
+                break
+
+    if any(deleted.values()):
+        frappe.logger("yana_efris").info(f"EFRIS request logs older than {days} days purged: {deleted}")
+    return deleted
+
+
+@frappe.whitelist()
+def get_request_log_data(name):
+    """Decompressed arguments of one EFRIS Request Log row."""
+    frappe.only_for("System Manager")
+    return decompress(frappe.db.get_value("EFRIS Request Log", name, "data"))
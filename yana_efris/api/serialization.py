@@ -0,0 +1,84 @@
+"""
+Compact JSON (de)serialization for EFRIS envelopes.
+
+Uses orjson when it is installed and falls back to the stdlib json module.
+Kept free of frappe imports so it can be benchmarked outside a site.
+"""
+import datetime
+import json
+from decimal import ROUND_HALF_UP, Decimal
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+COMPACT_SEPARATORS = (",", ":")
+TWO_PLACES = Decimal("0.01")
+
+
+def format_amount(value, places=TWO_PLACES):
+    """Pre-format a number as a fixed-point string (EFRIS wants amounts as "123.45")."""
+    if value in (None, ""):
+        value = 0
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return str(value.quantize(places, rounding=ROUND_HALF_UP))
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, (datetime.date, datetime.datetime, datetime.time)):
+        return obj.isoformat()
+    if hasattr(obj, "as_dict"):
+        return obj.as_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj):
+    """Serialize obj to a compact JSON str (no indentation, no key sorting)."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(obj, separators=COMPACT_SEPARATORS, ensure_ascii=False, default=_default)
+
+
+def dumps_bytes(obj):
+    """Same as dumps() but returns UTF-8 bytes (ready for gzip / AES)."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return dumps(obj).encode("utf-8")
+
+
+def loads(data):
+    """Parse JSON from str or bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class CompactJSON:
+    """
+    Drop-in stand-in for the json module used by uganda_compliance's efris_api.
+    Plain dumps/loads go through the fast path; calls with extra options fall back to stdlib.
+    """
+
+    JSONDecodeError = json.JSONDecodeError
+
+    @staticmethod
+    def dumps(obj, **kwargs):
+        if kwargs:
+            return json.dumps(obj, **kwargs)
+        return dumps(obj)
+
+    @staticmethod
+    def loads(data, **kwargs):
+        if kwargs:
+            return json.loads(data, **kwargs)
+        return loads(data)
+
+    def __getattr__(self, name):
+        return getattr(json, name)
+
+
+compact_json = CompactJSON()
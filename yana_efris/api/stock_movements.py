@@ -0,0 +1,308 @@
+from collections import defaultdict
+
+import frappe
+from frappe.utils import cint, flt, getdate, now_datetime
+
+from yana_efris.api.dispatch import bulk_lane, efris_post
+from yana_efris.api.goods_registration import UOM_CODE_COLUMNS, _first_column
+from yana_efris.api.jobs import rejected_goods
+from yana_efris.api.offline_queue import is_outage
+from yana_efris.api.serialization import format_amount
+
+# ─────────────────────────────────────────────────────
+# Config (site_config.json)
+#   efris_stock_reporting: 1 to report stock movements to EFRIS (T131); default off
+# ─────────────────────────────────────────────────────
+STOCK_IN, STOCK_OUT = "101", "102"
+STOCK_IN_LOCAL_PURCHASE = "102"
+STOCK_IN_MANUFACTURE = "103"
+ADJUST_OTHERS = "104"
+T131_CHUNK = 100            # goods per stock maintain request
+FLUSH_ROWS = 2000           # movement lines taken per company job run
+MAX_ATTEMPTS = 5
+
+def reporting_enabled():
+    return cint(frappe.conf.get("efris_stock_reporting"))
+
+# ─────────────────────────────────────────────────────
+# Collect (doc_events on_submit / on_cancel)
+# ─────────────────────────────────────────────────────
+def _efris_items(company, item_codes):
+    """
+    {item_code: EFRIS measure unit code or None} for the company's EFRIS Items:
+    the EFRIS Goods mirror first, else the EFRIS code on the stock UOM (when the
+    UOM doctype has one). Never the ERPNext UOM name - EFRIS wants its own codes.
+    """
+    item_codes = list({code for code in item_codes if code})
+    if not item_codes:
+        return {}
+    uom_code = _first_column("UOM", UOM_CODE_COLUMNS)
+    rows = frappe.db.sql(
+        f"""
+        SELECT i.name, g.measure_unit, {f"u.`{uom_code}`" if uom_code else "NULL"} AS uom_code
+        FROM `tabItem` i
+        LEFT JOIN `tabEFRIS Goods` g ON g.company = %(company)s AND g.goods_code = i.name
+        LEFT JOIN `tabUOM` u ON u.name = i.stock_uom
+        WHERE i.name IN %(items)s AND i.efris_e_company = %(company)s
+        """,
+        {"company": company, "items": item_codes},
+        as_dict=True,
+    )
+    return {row.name: row.measure_unit or row.uom_code or None for row in rows}
+
+def _movement_lines(doc):
+    """(goods_code, qty, rate, uom, operation_type, stock_type, supplier_tin, supplier_name) for a submitted doc."""
+    if doc.doctype in ("Purchase Invoice", "Purchase Receipt"):
+        if doc.doctype == "Purchase Invoice" and not doc.get("update_stock"):
+            return []   # stock comes in on the Purchase Receipt instead (reported from there)
+        supplier_tin = frappe.db.get_value("Supplier", doc.supplier, "tax_id") or ""
+        operation = STOCK_OUT if doc.get("is_return") else STOCK_IN
+        stock_type = ADJUST_OTHERS if doc.get("is_return") else STOCK_IN_LOCAL_PURCHASE
+        # quantity in stock UOM (accepted quantity on receipts), so the rate has to be per stock UOM too
+        return [
+            (row.item_code, abs(flt(row.stock_qty or row.qty)),
+             flt(row.base_net_rate or row.rate) / (flt(row.conversion_factor) or 1), row.stock_uom,
+             operation, stock_type, supplier_tin, doc.supplier_name or doc.supplier)
+            for row in doc.items
+        ]
+
+    if doc.doctype == "Stock Entry":
+        purpose = doc.get("purpose") or doc.get("stock_entry_type")
+        lines = []
+        for row in doc.items:
+            if row.t_warehouse and not row.s_warehouse:
+                stock_type = STOCK_IN_MANUFACTURE if purpose == "Manufacture" else STOCK_IN_LOCAL_PURCHASE
+                lines.append((row.item_code, flt(row.transfer_qty or row.qty), flt(row.basic_rate), row.stock_uom,
+                              STOCK_IN, stock_type, "", ""))
+            elif row.s_warehouse and not row.t_warehouse:
+                lines.append((row.item_code, flt(row.transfer_qty or row.qty), flt(row.basic_rate), row.stock_uom,
+                              STOCK_OUT, ADJUST_OTHERS, "", ""))
+            # warehouse transfers don't change EFRIS stock
+        return lines
+
+    return []
+
+def _insert_lines(doc, lines, known_units=False):
+    """
+    Lines without an EFRIS measure unit are stored as Failed (fix the mapping,
+    then retry_failed_movements). known_units: the lines already carry EFRIS
+    measure unit codes (reversals of sent lines).
+    """
+    items = _efris_items(doc.company, [line[0] for line in lines])
+    now = now_datetime()
+    values = []
+    for goods_code, qty, rate, uom, operation, stock_type, supplier_tin, supplier_name in lines:
+        if goods_code not in items or not qty:
+            continue
+        measure_unit = uom if known_units else items[goods_code]
+        values.append((
+            frappe.generate_hash(length=12), now, now, frappe.session.user, frappe.session.user,
+            doc.company, goods_code, qty, rate, measure_unit, operation, stock_type, supplier_tin, supplier_name,
+            "Pending" if measure_unit else "Failed", 0, doc.doctype, doc.name,
+            None if measure_unit else f"No EFRIS measure unit code for {goods_code} (stock UOM {uom})",
+        ))
+    if values:
+        frappe.db.bulk_insert(
+            "EFRIS Stock Movement",
+            fields=[
+                "name", "creation", "modified", "owner", "modified_by",
+                "company", "goods_code", "quantity", "unit_price", "measure_unit", "operation_type", "stock_type",
+                "supplier_tin", "supplier_name", "status", "attempts", "reference_doctype", "reference_name",
+                "last_error",
+            ],
+            values=values,
+        )
+    return len(values)
+
+def record_stock_movement(doc, method=None):
+    """on_submit (Purchase Invoice, Purchase Receipt, Stock Entry): buffer EFRIS stock lines - one insert, no EFRIS call."""
+    if reporting_enabled():
+        _insert_lines(doc, _movement_lines(doc))
+
+def reverse_stock_movement(doc, method=None):
+    """on_cancel: drop lines not sent yet; reverse the ones EFRIS already has."""
+    if not reporting_enabled():
+        return
+    # a flush is sending this document's lines right now - whether EFRIS takes them isn't known yet
+    if frappe.db.exists(
+        "EFRIS Stock Movement", {"reference_doctype": doc.doctype, "reference_name": doc.name, "status": "Processing"}
+    ):
+        frappe.throw(
+            frappe._("EFRIS stock movements of {0} are being sent right now. Please cancel again in a minute.").format(doc.name),
+            title=frappe._("EFRIS Stock Sync In Progress"),
+        )
+    frappe.db.delete(
+        "EFRIS Stock Movement",
+        {"reference_doctype": doc.doctype, "reference_name": doc.name, "status": ["in", ["Pending", "Failed"]]},
+    )
+    sent = frappe.get_all(
+        "EFRIS Stock Movement",
+        filters={"reference_doctype": doc.doctype, "reference_name": doc.name, "status": "Sent"},
+        fields=["goods_code", "quantity", "unit_price", "measure_unit", "operation_type"],
+    )
+    _insert_lines(doc, [
+        (row.goods_code, row.quantity, row.unit_price, row.measure_unit,
+         STOCK_OUT if row.operation_type == STOCK_IN else STOCK_IN,
+         ADJUST_OTHERS if row.operation_type == STOCK_IN else STOCK_IN_LOCAL_PURCHASE, "", "")
+        for row in sent
+    ], known_units=True)
+
+# ─────────────────────────────────────────────────────
+# Flush (scheduler, every minute)
+# ─────────────────────────────────────────────────────
+def flush_stock_movements():
+    if not reporting_enabled():
+        return
+    for company in frappe.get_all("EFRIS Stock Movement", filters={"status": "Pending"}, pluck="company", distinct=True):
+        frappe.enqueue(
+            "yana_efris.api.stock_movements.submit_company_movements",
+            queue="long",
+            timeout=1800,
+            job_id=f"efris_stock_movements::{company}",
+            deduplicate=True,
+            company=company,
+        )
+
+def _coalesce(rows):
+    """
+    Group lines by T131 header (operation, type, supplier) and merge lines of the
+    same goodsCode: quantities add up, the unit price is quantity-weighted.
+    """
+    batches = defaultdict(dict)
+    for row in rows:
+        header = (row.operation_type, row.stock_type, row.supplier_tin or "", row.supplier_name or "")
+        goods = batches[header].setdefault(row.goods_code, {"quantity": 0.0, "value": 0.0, "measure_unit": row.measure_unit, "rows": []})
+        goods["quantity"] += flt(row.quantity)
+        goods["value"] += flt(row.quantity) * flt(row.unit_price)
+        goods["rows"].append(row.name)
+    return batches
+
+def _build_content(company, header, goods_codes, goods):
+    operation, stock_type, supplier_tin, supplier_name = header
+    stock_in = {
+        "operationType": operation,
+        "supplierTin": supplier_tin,
+        "supplierName": supplier_name,
+        "adjustType": stock_type if operation == STOCK_OUT else "",
+        "remarks": f"Batched from ERPNext ({company})",
+        "stockInDate": str(getdate()),
+        "stockInType": stock_type if operation == STOCK_IN else "",
+        "productionBatchNo": "",
+        "productionDate": "",
+        "branchId": "",
+        "invoiceNo": "",
+        "isCheckBatchNo": "0",
+        "rollBackIfError": "0",
+        "goodsTypeCode": "101",
+    }
+    items = []
+    for code in goods_codes:
+        data = goods[code]
+        items.append({
+            "goodsCode": code,
+            "measureUnit": data["measure_unit"] or "",
+            "quantity": f"{data['quantity']:.2f}".rstrip("0").rstrip("."),
+            "unitPrice": format_amount(data["value"] / data["quantity"] if data["quantity"] else 0),
+            "remarks": "",
+        })
+    return {"goodsStockIn": stock_in, "goodsStockInItem": items}
+
+@bulk_lane()
+def submit_company_movements(company):
+    """Send pending movement lines of one company as coalesced, chunked T131 calls."""
+    batch_id = frappe.generate_hash(length=10)
+
+    # lines left in Processing by a killed worker go back to the front of the line
+    frappe.db.set_value(
+        "EFRIS Stock Movement", {"company": company, "status": "Processing"}, "status", "Pending", update_modified=False
+    )
+
+    rows = frappe.get_all(
+        "EFRIS Stock Movement",
+        filters={"company": company, "status": "Pending"},
+        fields=["name", "goods_code", "quantity", "unit_price", "measure_unit", "operation_type", "stock_type",
+                "supplier_tin", "supplier_name", "attempts"],
+        order_by="creation asc",
+        limit_page_length=FLUSH_ROWS,
+    )
+    if not rows:
+        return
+    frappe.db.set_value(
+        "EFRIS Stock Movement", {"name": ["in", [row.name for row in rows]], "status": "Pending"},
+        {"status": "Processing", "batch_id": batch_id}, update_modified=False,
+    )
+    frappe.db.commit()
+
+    # only lines this run claimed - a cancel may have deleted some since they were read
+    claimed = set(frappe.get_all("EFRIS Stock Movement", filters={"batch_id": batch_id, "status": "Processing"}, pluck="name"))
+    rows = [row for row in rows if row.name in claimed]
+    if not rows:
+        return
+    attempts = {row.name: cint(row.attempts) for row in rows}
+
+    sent = failed = 0
+    for header, goods in _coalesce(rows).items():
+        codes = list(goods)
+        for start in range(0, len(codes), T131_CHUNK):
+            chunk = codes[start:start + T131_CHUNK]
+            try:
+                success, response = efris_post(
+                    interfaceCode="T131", content=_build_content(company, header, chunk, goods), company_name=company
+                )
+            except Exception as e:
+                success, response = False, e
+
+            if not success:
+                # outage: everything stays pending; rejection: count an attempt, give up after MAX_ATTEMPTS
+                _retry([name for code in chunk for name in goods[code]["rows"]], attempts, response, count=not is_outage(response))
+                failed += len(chunk)
+                continue
+
+            rejected = rejected_goods(response)
+            for code in chunk:
+                names = goods[code]["rows"]
+                if code in rejected:
+                    _retry(names, attempts, rejected[code])
+                    failed += 1
+                else:
+                    frappe.db.set_value(
+                        "EFRIS Stock Movement", {"name": ["in", names]},
+                        {"status": "Sent", "sent_on": now_datetime(), "last_error": None}, update_modified=False,
+                    )
+                    sent += 1
+            frappe.db.commit()
+
+    frappe.db.commit()
+    frappe.logger("yana_efris").info(f"EFRIS stock movements for {company}: goods sent={sent} failed={failed} (batch {batch_id})")
+
+    if len(rows) == FLUSH_ROWS and frappe.db.exists("EFRIS Stock Movement", {"company": company, "status": "Pending"}):
+        flush_stock_movements()
+
+def _retry(names, attempts, error, count=True):
+    """Back to Pending for the next flush, or Failed once MAX_ATTEMPTS is reached - two bulk updates."""
+    retry, give_up = [], []
+    for name in names:
+        attempts[name] += 1 if count else 0
+        (give_up if attempts[name] >= MAX_ATTEMPTS else retry).append(name)
+    for status, group in (("Pending", retry), ("Failed", give_up)):
+        if group:
+            frappe.db.sql(
+                """UPDATE `tabEFRIS Stock Movement`
+                   SET status = %(status)s, attempts = attempts + %(inc)s, last_error = %(error)s
+                   WHERE name IN %(names)s""",
+                {"status": status, "inc": 1 if count else 0, "error": str(error)[:1000], "names": group},
+            )
+
+@frappe.whitelist()
+def retry_failed_movements(company=None):
+    """Put Failed lines back in the queue (e.g. after fixing goods registration)."""
+    frappe.only_for(["System Manager", "Stock Manager"])
+    filters = {"status": "Failed"}
+    if company:
+        filters["company"] = company
+    names = frappe.get_all("EFRIS Stock Movement", filters=filters, pluck="name")
+    if names:
+        frappe.db.set_value("EFRIS Stock Movement", {"name": ["in", names]}, {"status": "Pending", "attempts": 0}, update_modified=False)
+        frappe.db.commit()
+        flush_stock_movements()
+    return len(names)
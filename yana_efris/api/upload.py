@@ -0,0 +1,166 @@
+import functools
+import gzip
+import inspect
+from contextlib import contextmanager
+
+import frappe
+from frappe.utils import cint
+
+from yana_efris.api.serialization import CompactJSON
+
+# ─────────────────────────────────────────────────────
+# Config (site_config.json)
+#   efris_upload_mode:           "plain" (default, unchanged) | "compact" (drop empty optional sections)
+#                                | "gzip" (compact + gzip content above the threshold, zipCode = "1")
+#   efris_upload_gzip_threshold: plaintext bytes from which content is gzipped (default 8192)
+# ─────────────────────────────────────────────────────
+DEFAULT_GZIP_THRESHOLD = 8192
+COMPRESSIBLE_CODES = {"T109"}
+
+# accepted parameter names of make_post's encrypt helper: (plaintext, key) in either order
+PLAINTEXT_PARAMS = ("data", "plaintext", "plain_text", "content", "text", "message")
+KEY_PARAMS = ("key", "aeskey", "aes_key")
+
+# T109 sections the interface treats as optional; dropped only when empty
+OPTIONAL_SECTIONS = ("extend", "importServicesSeller", "airlineGoodsDetails", "edcDetails", "agentEntity")
+
+
+def upload_mode():
+    mode = (frappe.conf.get("efris_upload_mode") or "plain").lower()
+    return mode if mode in ("plain", "compact", "gzip") else "plain"
+
+
+def gzip_threshold():
+    return cint(frappe.conf.get("efris_upload_gzip_threshold")) or DEFAULT_GZIP_THRESHOLD
+
+
+# ─────────────────────────────────────────────────────
+# Trimming
+# ─────────────────────────────────────────────────────
+def _is_empty(value):
+    if isinstance(value, dict):
+        return all(_is_empty(v) for v in value.values())
+    if isinstance(value, list):
+        return all(_is_empty(v) for v in value)
+    return value in (None, "")
+
+
+def trim_optional_sections(einvoice_json):
+    """Drop placeholder sections ({} / [{}]) the T109 interface doesn't require."""
+    for section in OPTIONAL_SECTIONS:
+        if section in einvoice_json and _is_empty(einvoice_json[section]):
+            del einvoice_json[section]
+    return einvoice_json
+
+
+def prepare_upload(einvoice_json):
+    """T109 content as it should go on the wire for the configured upload mode."""
+    if upload_mode() != "plain":
+        trim_optional_sections(einvoice_json)
+    return einvoice_json
+
+
+# ─────────────────────────────────────────────────────
+# Compression (hooks into uganda_compliance's efris_api, see yana_efris.overrides.patching)
+# ─────────────────────────────────────────────────────
+@contextmanager
+def upload_compression(interface_code):
+    """Arm content compression for the make_post call inside the block."""
+    armed = interface_code in COMPRESSIBLE_CODES and upload_mode() == "gzip"
+    frappe.local.efris_gzip_armed = armed
+    frappe.local.efris_content_zipped = False
+    try:
+        yield
+    finally:
+        frappe.local.efris_gzip_armed = False
+        frappe.local.efris_content_zipped = False
+
+
+def _looks_like_json(value):
+    if isinstance(value, bytes):
+        return value[:1] in (b"{", b"[")
+    return isinstance(value, str) and value[:1] in ("{", "[")
+
+
+def plaintext_parameter(signature):
+    """Name of the plaintext parameter, or None unless the signature is exactly (plaintext, key)."""
+    params = list(signature.parameters.values())
+    if len(params) != 2 or any(p.kind not in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD) for p in params):
+        return None
+    plain = [p.name for p in params if p.name.lower() in PLAINTEXT_PARAMS]
+    keys = [p.name for p in params if p.name.lower() in KEY_PARAMS]
+    return plain[0] if len(plain) == 1 and len(keys) == 1 else None
+
+
+def compressing_encrypt(encrypt):
+    """
+    Wrap make_post's AES encrypt helper: when armed and the JSON plaintext is
+    over the threshold, gzip it first (EFRIS order: gzip -> AES -> base64).
+    Returns `encrypt` unchanged (and logs why) when its signature isn't the
+    expected (plaintext, key) pair - compressing the wrong argument would
+    corrupt every request without an error.
+    """
+    try:
+        signature = inspect.signature(encrypt)
+        param = plaintext_parameter(signature)
+    except (TypeError, ValueError):
+        signature, param = None, None
+    if param is None:
+        _log_skipped_patch(encrypt, signature)
+        return encrypt
+
+    @functools.wraps(encrypt)
+    def wrapper(*args, **kwargs):
+        if not getattr(frappe.local, "efris_gzip_armed", False):
+            return encrypt(*args, **kwargs)
+
+        bound = signature.bind(*args, **kwargs)
+        original = bound.arguments[param]
+        if not _looks_like_json(original):
+            return encrypt(*args, **kwargs)
+
+        plaintext = original.encode("utf-8") if isinstance(original, str) else original
+        if len(plaintext) < gzip_threshold():
+            return encrypt(*args, **kwargs)
+
+        bound.arguments[param] = gzip.compress(plaintext)
+        try:
+            encrypted = encrypt(*bound.args, **bound.kwargs)
+        except (AttributeError, TypeError):
+            # helper only accepts text in this uganda_compliance version - send uncompressed
+            return encrypt(*args, **kwargs)
+
+        frappe.local.efris_gzip_armed = False     # content only; signatures etc. stay untouched
+        frappe.local.efris_content_zipped = True
+        return encrypted
+
+    wrapper.__yana_compressing__ = True
+    return wrapper
+
+
+def _log_skipped_patch(encrypt, signature):
+    message = (
+        f"efris_upload_mode 'gzip' disabled: {getattr(encrypt, '__qualname__', encrypt)}{signature or '(?)'} "
+        f"is not the expected (plaintext, key) encrypt helper; content is sent uncompressed"
+    )
+    try:
+        frappe.log_error(message, "EFRIS UPLOAD")
+    except Exception:
+        # patched at import time, possibly before a site / DB connection exists
+        frappe.logger("yana_efris").error(message)
+
+
+class EnvelopeJSON(CompactJSON):
+    """compact_json that also flags gzipped content in the envelope's dataDescription."""
+
+    @staticmethod
+    def dumps(obj, **kwargs):
+        if getattr(frappe.local, "efris_content_zipped", False) and isinstance(obj, dict):
+            description = (obj.get("data") or {}).get("dataDescription")
+            if isinstance(description, dict):
+                description["zipCode"] = "1"
+                frappe.local.efris_content_zipped = False
+        return CompactJSON.dumps(obj, **kwargs)
+
+
+envelope_json = EnvelopeJSON()
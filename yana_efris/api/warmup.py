@@ -0,0 +1,139 @@
+import threading
+import time
+
+import frappe
+
+from yana_efris.api.efris_settings import get_company_settings
+
+# ─────────────────────────────────────────────────────
+# Config (site_config.json)
+#   efris_warmup:           0 disables the per-process warm-up on first request / EFRIS job (default on)
+#   efris_warmup_companies: companies to warm; default = every E Company that is also a Company
+# ─────────────────────────────────────────────────────
+_started = set()                # sites warmed (or warming) in this process
+_lock = threading.Lock()
+
+
+def get_efris_companies():
+    companies = frappe.conf.get("efris_warmup_companies")
+    if companies:
+        return list(companies)
+    if not frappe.db.table_exists("E Company"):
+        return []
+    return frappe.get_all("Company", filters={"name": ["in", frappe.get_all("E Company", pluck="name") or [""]]}, pluck="name")
+
+
+# ─────────────────────────────────────────────────────
+# Warm-up steps
+# ─────────────────────────────────────────────────────
+def _warm_imports():
+    """Crypto + EFRIS modules (the uganda_compliance import also applies our patches)."""
+    import uganda_compliance.efris.api_classes.e_invoice
+    import uganda_compliance.efris.api_classes.efris_api
+    from Crypto.Cipher import AES
+
+    import yana_efris.api.efris_api
+
+    # first cipher construction loads the native backend
+    AES.new(b"\0" * 16, AES.MODE_ECB).encrypt(b"\0" * 16)
+
+
+def _warm_credentials(company):
+    """Per-company settings (Company, E Company, tax templates)."""
+    return get_company_settings(company)
+
+
+def _warm_seller_details(company, settings):
+    """Company document get_seller_details_json reads (shared Redis document cache)."""
+    frappe.get_cached_doc("Company", company)
+    if settings.e_company:
+        frappe.get_cached_doc("E Company", settings.e_company.name)
+
+
+def _warm_tax_templates(settings):
+    for template in settings.tax_templates:
+        frappe.get_cached_doc("Item Tax Template", template.name)
+
+
+def warm_up(companies=None, verbose=False):
+    """Preload everything the first EFRIS call would otherwise pay for. Returns {step: ms}."""
+    timings = {}
+
+    def timed(label, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        except Exception as e:
+            frappe.log_error(f"EFRIS warm-up step '{label}' failed: {e}", "EFRIS WARM-UP")
+        finally:
+            timings[label] = round((time.perf_counter() - start) * 1000, 1)
+            if verbose:
+                print(f"  {label:<48}{timings[label]:>10.1f} ms")
+
+    timed("imports + cipher", _warm_imports)
+    for company in companies or get_efris_companies():
+        settings = timed(f"{company}: credentials / settings", _warm_credentials, company)
+        if settings is None:
+            continue
+        timed(f"{company}: seller details", _warm_seller_details, company, settings)
+        timed(f"{company}: item tax templates ({len(settings.tax_templates)})", _warm_tax_templates, settings)
+
+    if verbose:
+        print(f"  {'total':<48}{sum(timings.values()):>10.1f} ms")
+    return timings
+
+
+# ─────────────────────────────────────────────────────
+# Once-per-process hooks (before_request, before_job)
+# ─────────────────────────────────────────────────────
+def _claim():
+    """True the first time this process asks for the current site (warm-up enabled)."""
+    site = getattr(frappe.local, "site", None)
+    if not site or site in _started or frappe.conf.get("efris_warmup", 1) in (0, "0"):
+        return False
+    with _lock:
+        if site in _started:
+            return False
+        _started.add(site)
+    return True
+
+
+def warm_up_worker(method=None, kwargs=None, **_):
+    """
+    before_job: warm up inline, once per worker process, before the first EFRIS job.
+    Inline because the job needs it right away. Limited to EFRIS jobs and to the
+    company the job names (modules only when it names none) - rq's default worker
+    forks a work-horse per job, so there every EFRIS job warms its own process.
+    """
+    if not str(method or "").startswith(("yana_efris.", "uganda_compliance.")) or not _claim():
+        return
+    kwargs = kwargs or {}
+    company = kwargs.get("company") or kwargs.get("company_name") or kwargs.get("e_company_name")
+    try:
+        if isinstance(company, str):
+            warm_up([company])
+        else:
+            _warm_imports()
+    except Exception:
+        frappe.logger("yana_efris").exception("EFRIS warm-up failed")
+
+
+def warm_up_once():
+    """before_request: start the warm-up in a background thread the first time a process serves this site."""
+    if not _claim():
+        return
+    site = frappe.local.site
+
+    def run():
+        frappe.init(site=site)
+        frappe.connect()
+        try:
+            frappe.set_user("Administrator")
+            timings = warm_up()
+            frappe.logger("yana_efris").info(f"EFRIS warm-up for {site}: {timings}")
+        except Exception:
+            frappe.logger("yana_efris").exception("EFRIS warm-up failed")
+        finally:
+            frappe.destroy()
+
+    threading.Thread(target=run, name="efris-warm-up", daemon=True).start()
@@ -0,0 +1,52 @@
+"""
+Query-count benchmark for the per-company EFRIS settings cache.
+
+Compares the DB reads of loading a company's settings on every call with the
+per-worker cache in yana_efris.api.efris_settings, plus the per-item tax template
+lookup of the T127 item sync. Only yana_efris' own reads are measured - the
+settings make_post resolves inside uganda_compliance are not cached or timed here.
+
+    bench --site <site> execute yana_efris.benchmarks.efris_settings_bench.run --kwargs "{'company': 'My Co'}"
+"""
+import time
+
+import frappe
+
+from yana_efris.api import efris_settings
+from yana_efris.api.profiling import count_queries
+
+HINTS = ("Standard", "Zero", "Exempt", "Deemed", None)
+
+
+def _run(fn, calls):
+    with count_queries() as queries:
+        start = time.perf_counter()
+        for i in range(calls):
+            fn(i)
+        elapsed = time.perf_counter() - start
+    return queries.count, elapsed * 1000
+
+
+def _uncached_template(company, hint):
+    filters = {"company": company}
+    if hint:
+        filters["title"] = ["like", f"%{hint}%"]
+    return frappe.db.get_value("Item Tax Template", filters, "name")
+
+
+def run(company, calls=500):
+    efris_settings.clear_local_cache()
+    cases = {
+        "settings, uncached": lambda i: efris_settings.load_company_settings(company),
+        "settings, cached": lambda i: efris_settings.get_company_settings(company),
+        "tax template, per item query": lambda i: _uncached_template(company, HINTS[i % len(HINTS)]),
+        "tax template, cached": lambda i: efris_settings.find_tax_template(company, HINTS[i % len(HINTS)]),
+    }
+
+    rows = []
+    print(f"{'case':<32}{'calls':>7}{'queries':>9}{'per call':>10}{'ms':>10}")
+    for label, fn in cases.items():
+        queries, ms = _run(fn, calls)
+        rows.append({"case": label, "calls": calls, "queries": queries, "ms": ms})
+        print(f"{label:<32}{calls:>7}{queries:>9}{queries / calls:>10.2f}{ms:>10.1f}")
+    return rows
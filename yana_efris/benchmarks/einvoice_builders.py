@@ -0,0 +1,125 @@
+"""
+Benchmark for the E Invoice payload builders (get_einvoice_json, get_seller_details_json, get_tax_details).
+
+Builds synthetic draft Sales Invoices (mixed Item Tax Templates, line and invoice
+discounts, credit notes) inside a transaction that is rolled back at the end, and
+reports build time, SQL query count and allocations (tracemalloc) per builder.
+
+    bench --site <site> execute yana_efris.benchmarks.einvoice_builders.run \
+        --kwargs "{'company': 'My Co', 'customer': 'Walk In', 'items': ['ITEM-1', 'ITEM-2']}"
+    ... --kwargs "{'company': 'My Co', 'customer': 'Walk In', 'items': ['ITEM-1'], 'sizes': [10, 100], 'repeat': 5}"
+
+To profile one real invoice in production instead, call generate_irn with
+efris_profile=1 (or efris_profile=pyinstrument) as a System Manager.
+"""
+import time
+import tracemalloc
+
+import frappe
+
+from yana_efris.api.profiling import count_queries
+from yana_efris.doctype.e_invoice import e_invoice as yana_e_invoice
+
+DEFAULT_SIZES = (10, 100, 1000, 5000)
+
+
+def make_sales_invoice(company, customer, items, lines, tax_templates=(), is_return=False):
+    """Insert a draft Sales Invoice with `lines` rows cycling over `items` and `tax_templates`."""
+    si = frappe.new_doc("Sales Invoice")
+    si.company = company
+    si.customer = customer
+    si.is_return = int(is_return)
+    si.update_stock = 0
+    si.set_posting_time = 1
+    qty = -1 if is_return else 1
+
+    for i in range(lines):
+        row = {
+            "item_code": items[i % len(items)],
+            "qty": qty * (1 + i % 5),
+            "rate": 1000 + (i % 7) * 250,
+        }
+        if tax_templates:
+            row["item_tax_template"] = tax_templates[i % len(tax_templates)]
+        if i % 3 == 0:
+            row["discount_percentage"] = 10
+        si.append("items", row)
+
+    if not is_return:
+        si.apply_discount_on = "Grand Total"
+        si.additional_discount_percentage = 2
+
+    si.set_missing_values()
+    si.calculate_taxes_and_totals()
+    si.insert(ignore_permissions=True, ignore_mandatory=True)
+    return si
+
+
+def make_einvoice(sales_invoice):
+    """Unsaved E Invoice with invoice details loaded, as EInvoiceAPI.create_einvoice would build it."""
+    einvoice = frappe.new_doc("E Invoice")
+    einvoice.invoice = sales_invoice.name
+    einvoice.fetch_invoice_details()
+    return einvoice
+
+
+def measure(fn, repeat=3):
+    """Best-of-`repeat` wall time (ms), queries of the last run, and tracemalloc peak / net allocation (KiB)."""
+    best = None
+    for _ in range(repeat):
+        tracemalloc.start()
+        with count_queries() as queries:
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if best is None or elapsed < best[0]:
+            best = (elapsed, queries.count, peak, current)
+    elapsed, query_count, peak, current = best
+    return {"ms": elapsed * 1000, "queries": query_count, "peak_kib": peak / 1024, "net_kib": current / 1024}
+
+
+def run(company, customer, items, sizes=DEFAULT_SIZES, tax_templates=None, repeat=3, credit_notes=True):
+    items = frappe.parse_json(items) if isinstance(items, str) else items
+    sizes = frappe.parse_json(sizes) if isinstance(sizes, str) else sizes
+    if tax_templates is None:
+        tax_templates = frappe.get_all(
+            "Item Tax Template", filters={"company": company, "disabled": 0}, pluck="name", limit_page_length=3
+        )
+
+    scenarios = [(n, False) for n in sizes]
+    if credit_notes:
+        scenarios += [(n, True) for n in sizes]
+
+    rows = []
+    try:
+        for lines, is_return in scenarios:
+            si = make_sales_invoice(company, customer, items, lines, tax_templates, is_return)
+            einvoice = make_einvoice(si)
+            builders = {
+                "get_seller_details_json": lambda: einvoice.get_seller_details_json(si),
+                "get_tax_details": lambda: einvoice.get_tax_details(),
+                "get_tax_details (yana)": lambda: yana_e_invoice.get_tax_details(einvoice),
+                "get_einvoice_json": lambda: einvoice.get_einvoice_json(si),
+            }
+            for builder, fn in builders.items():
+                try:
+                    result = measure(fn, repeat)
+                except Exception as e:
+                    result = {"error": str(e)}
+                rows.append({"lines": lines, "credit_note": is_return, "builder": builder, **result})
+    finally:
+        frappe.db.rollback()
+
+    print(f"{'lines':>6} {'type':<7} {'builder':<26}{'ms':>10}{'queries':>9}{'peak KiB':>11}{'net KiB':>10}")
+    for row in rows:
+        kind = "credit" if row["credit_note"] else "invoice"
+        if "error" in row:
+            print(f"{row['lines']:>6} {kind:<7} {row['builder']:<26}  error: {row['error']}")
+            continue
+        print(
+            f"{row['lines']:>6} {kind:<7} {row['builder']:<26}"
+            f"{row['ms']:>10.1f}{row['queries']:>9}{row['peak_kib']:>11.1f}{row['net_kib']:>10.1f}"
+        )
+    return rows
@@ -0,0 +1,68 @@
+"""
+Import-time benchmark for app load (`python -X importtime`).
+
+Runs each import in a fresh interpreter and reports the cumulative import time,
+so the per-worker startup cost of `import yana_efris` can be compared with the
+EFRIS stack it used to pull in eagerly.
+
+    bench --site <site> execute yana_efris.benchmarks.import_time.run
+    python -m yana_efris.benchmarks.import_time      (from the bench's apps env)
+"""
+import subprocess
+import sys
+
+DEFAULT_MODULES = (
+    "yana_efris",                 # what every worker imports at app load
+    "yana_efris.api.efris_api",   # what yana_efris/__init__.py used to import eagerly
+)
+
+
+def measure(module, repeat=5):
+    """Best-of-`repeat` cumulative import time of `module` in µs, plus its heaviest sub-imports."""
+    best, heaviest = None, []
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+        rows = []
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            self_us, cumulative_us, name = _parse(line)
+            rows.append((cumulative_us, self_us, name))
+
+        total = next((cumulative for cumulative, _, name in reversed(rows) if name.strip() == module), None)
+        if total is not None and (best is None or total < best):
+            best = total
+            heaviest = sorted(rows, reverse=True)[:10]
+    return best, heaviest
+
+
+def _parse(line):
+    # "import time:       123 |        456 |   package.module"
+    head, cumulative, name = line.split("|", 2)
+    return int(head.split(":", 1)[1]), int(cumulative), name
+
+
+def run(modules=DEFAULT_MODULES, repeat=5):
+    results = {}
+    for module in modules:
+        try:
+            total, heaviest = measure(module, repeat)
+        except RuntimeError as e:
+            print(f"{module}: import failed ({e})")
+            continue
+        results[module] = total
+        print(f"\n{module}: {total / 1000:.1f} ms cumulative (best of {repeat})")
+        for cumulative, _self_us, name in heaviest:
+            print(f"  {cumulative / 1000:>8.1f} ms  {name.rstrip()}")
+    return results
+
+
+if __name__ == "__main__":
+    run(sys.argv[1:] or DEFAULT_MODULES)
@@ -0,0 +1,99 @@
+"""
+Microbenchmark: stdlib json vs orjson for EFRIS envelopes.
+
+    bench --site <site> execute yana_efris.benchmarks.serialization_bench.run
+    bench --site <site> execute yana_efris.benchmarks.serialization_bench.run --kwargs "{'lines': 2000}"
+"""
+import json
+import timeit
+
+from yana_efris.api import serialization
+
+
+def make_t109_payload(lines=500):
+    """Synthetic T109 content with `lines` goods rows."""
+    goods = []
+    for i in range(lines):
+        goods.append({
+            "item": f"Item {i}",
+            "itemCode": f"ITEM-{i:05d}",
+            "qty": "2",
+            "unitOfMeasure": "101",
+            "unitPrice": "11800.00",
+            "total": "23600.00",
+            "taxRate": "0.18",
+            "tax": "3600.00",
+            "discountTotal": "",
+            "discountTaxRate": "",
+            "orderNumber": str(i),
+            "discountFlag": "2",
+            "deemedFlag": "2",
+            "exciseFlag": "2",
+            "goodsCategoryId": "50202306",
+            "goodsCategoryName": "Beverages",
+        })
+    return {
+        "sellerDetails": {"tin": "1000000000", "legalName": "Test Seller", "branchId": "123"},
+        "basicInformation": {"invoiceNo": "", "deviceNo": "TCS0000000000", "currency": "UGX"},
+        "buyerDetails": {"buyerTin": "", "buyerType": "1", "buyerLegalName": "Walk In"},
+        "goodsDetails": goods,
+        "taxDetails": [{"taxCategoryCode": "01", "netAmount": "20000.00", "taxRate": "0.18", "taxAmount": "3600.00"}],
+        "summary": {"netAmount": "20000.00", "taxAmount": "3600.00", "grossAmount": "23600.00", "itemCount": str(lines)},
+    }
+
+
+def make_t127_response(page_size=99):
+    """Synthetic decoded T127 page."""
+    return {
+        "page": {"pageNo": 1, "pageSize": page_size, "pageCount": 40, "totalSize": 40 * page_size},
+        "records": [
+            {
+                "goodsCode": f"G{i:06d}",
+                "goodsName": f"Goods {i}",
+                "measureUnit": "101",
+                "unitPrice": "1000.00",
+                "currency": "101",
+                "taxRate": "0.18",
+                "goodsCategoryId": "50202306",
+                "goodsCategoryName": "Beverages",
+            }
+            for i in range(page_size)
+        ],
+    }
+
+
+def _time(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6  # µs per call
+
+
+def run(lines=500, number=200):
+    payloads = {
+        f"T109 ({lines} lines)": make_t109_payload(lines),
+        "T127 page (99 records)": make_t127_response(),
+    }
+    rows = []
+    for label, payload in payloads.items():
+        encoded = json.dumps(payload)
+        rows.append((
+            label,
+            _time(lambda: json.dumps(payload, indent=1, sort_keys=True), number),  # frappe.as_json style
+            _time(lambda: json.dumps(payload, separators=(",", ":")), number),
+            _time(lambda: serialization.dumps(payload), number),
+            _time(lambda: json.loads(encoded), number),
+            _time(lambda: serialization.loads(encoded), number),
+            len(json.dumps(payload, indent=1, sort_keys=True)),
+            len(serialization.dumps(payload)),
+        ))
+
+    backend = "orjson" if serialization.orjson is not None else "stdlib (orjson not installed)"
+    print(f"serialization backend: {backend}")
+    headers = ["as_json", "compact", "fast_dump", "json_load", "fast_load", "size_old", "size_new"]
+    print(f"{'payload':<26}" + "".join(f"{h:>11}" for h in headers))
+    for label, *values in rows:
+        times, sizes = values[:5], values[5:]
+        print(f"{label:<26}" + "".join(f"{t:>9.1f}µs" for t in times) + "".join(f"{s:>11}" for s in sizes))
+    return rows
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,62 @@
+"""
+Bytes on the wire for T109 content per invoice size and upload mode.
+
+EFRIS content travels as base64(AES(plaintext)); with zipCode = "1" the plaintext
+is gzipped first. Sizes below are the base64 content length for each mode.
+
+    bench --site <site> execute yana_efris.benchmarks.upload_size_bench.run
+    bench --site <site> execute yana_efris.benchmarks.upload_size_bench.run --kwargs "{'sizes': [1, 50, 500]}"
+"""
+import gzip
+import time
+
+from yana_efris.api.serialization import dumps_bytes
+from yana_efris.api.upload import DEFAULT_GZIP_THRESHOLD, trim_optional_sections
+from yana_efris.benchmarks.serialization_bench import make_t109_payload
+
+DEFAULT_SIZES = (1, 10, 100, 1000, 5000)
+
+
+def wire_size(plaintext):
+    """base64 length of AES-ECB (PKCS7) ciphertext for `plaintext`."""
+    padded = (len(plaintext) // 16 + 1) * 16
+    return 4 * ((padded + 2) // 3)
+
+
+def with_placeholders(payload):
+    payload.update({
+        "extend": {},
+        "importServicesSeller": {},
+        "airlineGoodsDetails": [{}],
+        "edcDetails": {},
+        "agentEntity": {},
+    })
+    return payload
+
+
+def run(sizes=DEFAULT_SIZES, threshold=DEFAULT_GZIP_THRESHOLD):
+    rows = []
+    print(f"{'lines':>6}{'plain':>12}{'compact':>12}{'gzip':>12}{'saved':>8}{'gzip ms':>9}")
+    for lines in sizes:
+        payload = with_placeholders(make_t109_payload(lines))
+        plain = dumps_bytes(payload)
+        compact = dumps_bytes(trim_optional_sections(payload))
+
+        start = time.perf_counter()
+        zipped = gzip.compress(compact) if len(compact) >= threshold else compact
+        gzip_ms = (time.perf_counter() - start) * 1000
+
+        row = {
+            "lines": lines,
+            "plain": wire_size(plain),
+            "compact": wire_size(compact),
+            "gzip": wire_size(zipped),
+            "gzip_ms": gzip_ms,
+        }
+        row["saved_pct"] = 100 * (1 - row["gzip"] / row["plain"])
+        rows.append(row)
+        print(
+            f"{lines:>6}{row['plain']:>12}{row['compact']:>12}{row['gzip']:>12}"
+            f"{row['saved_pct']:>7.1f}%{gzip_ms:>9.2f}"
+        )
+    return rows
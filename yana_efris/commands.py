@@ -0,0 +1,24 @@
+import click
+from frappe.commands import get_site, pass_context
+
+
+@click.command("efris-warm-up")
+@click.option("--company", "companies", multiple=True, help="Company to warm (repeatable); default all EFRIS companies")
+@pass_context
+def efris_warm_up(context, companies=None):
+    """Preload EFRIS credentials, cipher state, seller details and tax templates, with timings."""
+    import frappe
+
+    from yana_efris.api.warmup import warm_up
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        click.echo(f"EFRIS warm-up for {site}")
+        warm_up(list(companies) or None, verbose=True)
+    finally:
+        frappe.destroy()
+
+
+commands = [efris_warm_up]
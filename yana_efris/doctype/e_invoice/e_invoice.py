@@ -8,6 +8,7 @@ from uganda_compliance.efris.utils.utils import efris_log_info, efris_log_error
 from uganda_compliance.efris.doctype.e_invoice.e_invoice import _get_valid_document
 from uganda_compliance.efris.doctype.e_invoice.e_invoice import _calculate_taxes_and_discounts
 from uganda_compliance.efris.doctype.e_invoice.e_invoice import calculate_tax_by_category
+from yana_efris.api.einvoice_batch import get_prefetched_doc
 
 def get_einvoice_json(self, sales_invoice):
     """
@@ -50,8 +51,8 @@ def get_seller_details_json(self, sales_invoice):
         if not company_identifier:
             frappe.throw("No Company or Branch linked to this Sales Invoice. Please select a valid company.")
 
-        # fetch company doc (the branch)
-        company = frappe.get_doc("Company", company_identifier)
+        # fetch company doc (the branch) - served from the batch prefetch when bulk submitting
+        company = get_prefetched_doc("Company", company_identifier)
 
         # read branch-specific custom fields from Company
         branch_id = getattr(company, "custom_branch_id", "") or ""
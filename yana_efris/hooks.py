@@ -22,6 +22,60 @@ app_include_js = [
     "/assets/yana_efris/js/exchange_rate_common.js",
 ]
 
+doc_events = {
+    # company<->user index (yana_efris.overrides.company_permissions)
+    # and chat sidebar contact cache (yana_efris.overrides.chat_contacts)
+    "User Permission": {
+        "on_update": [
+            "yana_efris.overrides.company_permissions.on_user_permission_change",
+            "yana_efris.overrides.chat_contacts.invalidate_contact_cache",
+        ],
+        "after_delete": "yana_efris.overrides.company_permissions.on_user_permission_change",
+        "on_trash": "yana_efris.overrides.chat_contacts.invalidate_contact_cache",
+    },
+    "Contact": {
+        "on_update": "yana_efris.overrides.chat_contacts.invalidate_contact_cache_on_contact_change",
+        "on_trash": "yana_efris.overrides.chat_contacts.invalidate_contact_cache_on_contact_change",
+    },
+    "User": {
+        "on_update": "yana_efris.overrides.chat_contacts.invalidate_contact_cache_on_user_update",
+    },
+    # EFRIS goods registration check against the local mirror (EFRIS Goods)
+    "Item": {
+        "validate": "yana_efris.yana_efris.doctype.efris_goods.efris_goods.validate_item_registration",
+    },
+    "ClefinCode Chat Profile": {
+        "on_update": "yana_efris.overrides.chat_contacts.invalidate_contact_cache_on_profile_change",
+        "on_trash": "yana_efris.overrides.chat_contacts.invalidate_contact_cache_on_profile_change",
+    },
+    # batched EFRIS stock movement reporting (yana_efris.api.stock_movements)
+    "Purchase Invoice": {
+        "on_submit": "yana_efris.api.stock_movements.record_stock_movement",
+        "on_cancel": "yana_efris.api.stock_movements.reverse_stock_movement",
+    },
+    "Purchase Receipt": {
+        "on_submit": "yana_efris.api.stock_movements.record_stock_movement",
+        "on_cancel": "yana_efris.api.stock_movements.reverse_stock_movement",
+    },
+    "Stock Entry": {
+        "on_submit": "yana_efris.api.stock_movements.record_stock_movement",
+        "on_cancel": "yana_efris.api.stock_movements.reverse_stock_movement",
+    },
+    # per-worker EFRIS settings cache (yana_efris.api.efris_settings)
+    "E Company": {
+        "on_update": "yana_efris.api.efris_settings.bump_settings_version",
+        "on_trash": "yana_efris.api.efris_settings.bump_settings_version",
+    },
+    "Company": {
+        "on_update": "yana_efris.api.efris_settings.bump_settings_version",
+        "on_trash": "yana_efris.api.efris_settings.bump_settings_version",
+    },
+    "Item Tax Template": {
+        "on_update": "yana_efris.api.efris_settings.bump_settings_version",
+        "on_trash": "yana_efris.api.efris_settings.bump_settings_version",
+    },
+}
+
 # doctype_list_js = {
 #     "Item": "public/js/item_list.js"
 # }
@@ -185,6 +239,27 @@ app_include_js = [
 # Scheduled Tasks
 # ---------------
 
+scheduler_events = {
+    "cron": {
+        "* * * * *": [
+            "yana_efris.api.offline_queue.replay_offline_queue",
+            "yana_efris.api.request_log.flush_request_log_buffer",
+            "yana_efris.api.stock_movements.flush_stock_movements",
+        ],
+        "*/5 * * * *": [
+            "yana_efris.api.credit_note_poller.poll_credit_note_approvals",
+        ],
+    },
+    "daily": [
+        "yana_efris.api.request_log.purge_request_logs",
+    ],
+}
+
+# warm EFRIS modules / settings / templates once per process (yana_efris.api.warmup):
+# web workers in a background thread, background workers inline before their first EFRIS job
+before_request = ["yana_efris.api.warmup.warm_up_once"]
+before_job = ["yana_efris.api.warmup.warm_up_worker"]
+
 # scheduler_events = {
 # 	"all": [
 # 		"yana_efris.tasks.all"
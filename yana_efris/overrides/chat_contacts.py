@@ -1,85 +1,306 @@
+import functools
+import re
+from collections import defaultdict
+
 import frappe
+from frappe.utils import cint, get_datetime, now
+
+from yana_efris.overrides import company_permissions
+
+# ─────────────────────────────────────────────────────
+# Contact directory cache (per user + mode)
+# ─────────────────────────────────────────────────────
+CACHE_PREFIX = "yana_efris:chat_contacts:"
+GENERATION_KEY = "yana_efris:chat_contacts_generation"  # raw counter; part of every list key
+INVALIDATED_AT_KEY = "yana_efris:chat_contacts_invalidated_at"  # last membership change (see paginate_contacts)
+CACHE_TTL = 60 * 60  # safety net / cleanup of old generations; doc_events bump the generation
+
+# Server-side search (search_contacts)
+SEARCH_PAGE_SIZE = 50
+SEARCH_MAX_PAGE_SIZE = 200
+NUMBER_QUERY = re.compile(r"^\+?[\d\s-]+$")
 
 def get_user_companies(user_email):
-    """Fetch companies assigned via User Permission"""
-    return frappe.get_all(
-        "User Permission",
-        filters={"user": user_email, "allow": "Company"},
-        pluck="for_value"
-    )
+    """Companies assigned via User Permission (served from the company index)"""
+    return sorted(company_permissions.get_user_companies(user_email))
 
 def get_users_in_companies(companies):
-    """Fetch users who have permission for these companies"""
-    if not companies:
-        return []
-    return frappe.get_all(
-        "User Permission",
-        filters={"allow": "Company", "for_value": ["in", companies]},
-        pluck="user"
-    )
+    """Users who have permission for these companies (served from the company index)"""
+    return sorted(company_permissions.get_company_users(companies))
+
+def company_filter_condition(allowed_users, user_column="Contact.user"):
+    """
+    SQL condition restricting `user_column` to `allowed_users` (bound as %(allowed_users)s).
+    Returns "" when there is nothing to filter on (same as the old Python-side check).
+    """
+    if not allowed_users:
+        return ""
+    return f"AND {user_column} IN %(allowed_users)s"
+
+def attach_contact_details(contacts_list, contact_type=None):
+    """Fetch details for all profiles in one `parent IN (...)` query and group them in memory."""
+    if not contacts_list:
+        return contacts_list
+
+    values = {"profiles": tuple({c["profile_id"] for c in contacts_list})}
+    type_condition = ""
+    if contact_type:
+        type_condition = "AND type = %(contact_type)s"
+        values["contact_type"] = contact_type
+
+    details_by_profile = defaultdict(list)
+    for row in frappe.db.sql(f"""
+        SELECT parent, contact_info, type AS contact_type, `default`
+        FROM `tabClefinCode Chat Profile Contact Details`
+        WHERE parent IN %(profiles)s {type_condition}
+        ORDER BY idx
+    """, values, as_dict=True):
+        details_by_profile[row.pop("parent")].append(row)
+
+    for contact in contacts_list:
+        contact['contact_details'] = details_by_profile.get(contact['profile_id'], [])
+
+    return contacts_list
+
+def get_cached_contacts(user_email, mode, builder):
+    """Return the permission-scoped contact list for (user, mode), building it on a cache miss."""
+    cache = frappe.cache()
+    generation = cint(cache.get(cache.make_key(GENERATION_KEY)))
+    key = f"{CACHE_PREFIX}{generation}:{mode}:{user_email}"
+    contacts_list = cache.get_value(key)
+    if contacts_list is None:
+        if not frappe.cache().get_value(INVALIDATED_AT_KEY):
+            frappe.cache().set_value(INVALIDATED_AT_KEY, now())
+        contacts_list = builder(user_email)
+        frappe.cache().set_value(key, contacts_list, expires_in_sec=CACHE_TTL)
+    return contacts_list
+
+def paginate_contacts(contacts_list, cursor=None, limit=None, since=None):
+    """
+    Slice a cached contact list for the client.
+      - since: only rows modified after this timestamp (profile / contact edits carry
+        their own modified time). Falls back to the full list (full=True) when the
+        membership changed after `since` - permission changes, enabled/disabled users,
+        deleted profiles or contacts - because removals can't be expressed as a delta.
+      - cursor/limit: offset based paging over the (filtered) list.
+    """
+    full = True
+    if since:
+        since_dt = get_datetime(since)
+        invalidated_at = frappe.cache().get_value(INVALIDATED_AT_KEY)
+        if invalidated_at and get_datetime(invalidated_at) <= since_dt:
+            contacts_list = [c for c in contacts_list if c.get("modified") and get_datetime(c["modified"]) > since_dt]
+            full = False
+
+    offset = cint(cursor)
+    limit = cint(limit)
+    next_cursor = None
+    if limit:
+        if offset + limit < len(contacts_list):
+            next_cursor = str(offset + limit)
+        contacts_list = contacts_list[offset:offset + limit]
+    elif offset:
+        contacts_list = contacts_list[offset:]
+
+    return {
+        "contacts": contacts_list,
+        "next_cursor": next_cursor,
+        "full": full,
+        "generated_at": now(),
+    }
+
+def invalidate_contact_cache(doc=None, method=None, membership=True):
+    """
+    doc_events handler: retire every cached contact list (User Permission changes, ...).
+    Bumping the generation is O(1) - no KEYS scan; old lists expire with CACHE_TTL.
+    Runs after commit, so no list gets rebuilt from pre-commit rows under the new generation.
+    """
+    frappe.db.after_commit.add(functools.partial(_bump_generation, membership))
+
+def _bump_generation(membership):
+    cache = frappe.cache()
+    cache.incr(cache.make_key(GENERATION_KEY))
+    if membership:
+        cache.set_value(INVALIDATED_AT_KEY, now())
+
+def invalidate_contact_cache_on_profile_change(doc, method=None):
+    """Profile edits show up in `since` deltas by their modified time; only deletions change membership."""
+    invalidate_contact_cache(membership=method == "on_trash")
+
+def invalidate_contact_cache_on_contact_change(doc, method=None):
+    """Only Contacts of a user or behind a chat profile are in the directory - not customer/supplier contacts."""
+    before = doc.get_doc_before_save() if method == "on_update" else None
+    if (
+        doc.get("user")
+        or (before and before.get("user"))
+        or frappe.db.exists("ClefinCode Chat Profile", {"contact": doc.name})
+    ):
+        user_changed = bool(before) and before.get("user") != doc.get("user")
+        invalidate_contact_cache(membership=method == "on_trash" or user_changed)
+
+def invalidate_contact_cache_on_user_update(doc, method=None):
+    """Only enabling/disabling a User changes who shows up in the sidebar."""
+    if doc.has_value_changed("enabled"):
+        invalidate_contact_cache()
 
 @frappe.whitelist()
-def get_contacts(user_email):
-    companies = get_user_companies(user_email)
-    allowed_users = get_users_in_companies(companies)
+def get_contacts(user_email, cursor=None, limit=None, since=None):
+    contacts_list = get_cached_contacts(user_email, "all", _build_contacts)
+    return {"results": [paginate_contacts(contacts_list, cursor, limit, since)]}
 
-    contacts_list = frappe.db.sql("""
+
+@frappe.whitelist()
+def get_contacts_for_new_group(user_email, cursor=None, limit=None, since=None):
+    contacts_list = get_cached_contacts(user_email, "new_group", _build_contacts_for_new_group)
+    return {"results": [paginate_contacts(contacts_list, cursor, limit, since)]}
+
+
+def _build_contacts(user_email):
+    allowed_users = company_permissions.get_users_sharing_company(user_email)
+
+    # ✅ company filter runs in SQL instead of a Python list scan
+    contacts_list = frappe.db.sql(f"""
         SELECT DISTINCT ChatProfile.name AS profile_id,
                         ChatProfile.full_name,
                         Contact.user AS user_id,
-                        User.enabled
+                        User.enabled,
+                        GREATEST(ChatProfile.modified, Contact.modified) AS modified
         FROM `tabClefinCode Chat Profile` AS ChatProfile
         INNER JOIN `tabContact` AS Contact ON Contact.name = ChatProfile.contact
-        LEFT OUTER JOIN `tabUser` AS User ON User.name = Contact.user                     
+        LEFT OUTER JOIN `tabUser` AS User ON User.name = Contact.user
         WHERE (User.enabled = 1 OR User.enabled IS NULL)
+          {company_filter_condition(allowed_users)}
         ORDER BY Contact.user DESC
-    """, as_dict=True)
+    """, {"allowed_users": tuple(allowed_users)}, as_dict=True)
 
-    # ✅ filter only contacts of allowed users
-    if allowed_users:
-        contacts_list = [c for c in contacts_list if c.get("user_id") in allowed_users]
+    attach_contact_details(contacts_list)
 
-    for contact in contacts_list:
-        contact['contact_details'] = frappe.db.sql("""
-            SELECT contact_info, type AS contact_type, `default`
-            FROM `tabClefinCode Chat Profile Contact Details`
-            WHERE parent = %s
-        """, (contact['profile_id'],), as_dict=True)
-
-    return {"results": [{"contacts": contacts_list}]}
+    return contacts_list
 
 
-@frappe.whitelist()
-def get_contacts_for_new_group(user_email):
-    companies = get_user_companies(user_email)
-    allowed_users = get_users_in_companies(companies)
+def _build_contacts_for_new_group(user_email):
+    allowed_users = company_permissions.get_users_sharing_company(user_email)
 
-    contacts_list = frappe.db.sql("""
+    contacts_list = frappe.db.sql(f"""
         SELECT DISTINCT ChatProfile.name AS profile_id,
                         ChatProfile.full_name,
                         Contact.user AS user_id,
-                        User.enabled
+                        User.enabled,
+                        GREATEST(ChatProfile.modified, Contact.modified) AS modified
         FROM `tabClefinCode Chat Profile` AS ChatProfile
-        INNER JOIN `tabClefinCode Chat Profile Contact Details` AS ContactDetails 
+        INNER JOIN `tabClefinCode Chat Profile Contact Details` AS ContactDetails
             ON ContactDetails.parent = ChatProfile.name
         INNER JOIN `tabContact` AS Contact
             ON Contact.name = ChatProfile.contact
         LEFT OUTER JOIN `tabUser` AS User
-            ON User.name = Contact.user                     
+            ON User.name = Contact.user
         WHERE (User.enabled = 1 OR User.enabled IS NULL)
-          AND ContactDetails.contact_info <> %s
+          AND ContactDetails.contact_info <> %(user_email)s
           AND ContactDetails.type = 'Chat'
+          {company_filter_condition(allowed_users)}
         ORDER BY Contact.user DESC
-    """, (user_email,), as_dict=True)
+    """, {"user_email": user_email, "allowed_users": tuple(allowed_users)}, as_dict=True)
 
-    if allowed_users:
-        contacts_list = [c for c in contacts_list if c.get("user_id") in allowed_users]
+    attach_contact_details(contacts_list, contact_type="Chat")
 
-    for contact in contacts_list:
-        contact['contact_details'] = frappe.db.sql("""
-            SELECT contact_info, type AS contact_type, `default`
-            FROM `tabClefinCode Chat Profile Contact Details`
-            WHERE parent = %s AND type = 'Chat'
-        """, (contact['profile_id'],), as_dict=True)
+    return contacts_list
+
+
+# ─────────────────────────────────────────────────────
+# Searchable, keyset-paginated directory (large tenants)
+# ─────────────────────────────────────────────────────
+@frappe.whitelist()
+def search_contacts(user_email, query=None, mode="all", cursor=None, limit=None):
+    """
+    One page of the contact directory, filtered and paginated in SQL.
+      - query: name prefix (uses the full_name index) or, when it looks like a
+        phone number, a prefix of any contact_info
+      - mode: "all" (sidebar) or "new_group" (chat contacts other than the user)
+      - cursor: next_cursor from the previous page (keyset on full_name, profile)
+    Contact details are attached for the returned rows only.
+    """
+    limit = min(cint(limit) or SEARCH_PAGE_SIZE, SEARCH_MAX_PAGE_SIZE)
+    allowed_users = company_permissions.get_users_sharing_company(user_email)
+    values = {"user_email": user_email, "allowed_users": tuple(allowed_users)}
+    conditions = [company_filter_condition(allowed_users)]
+
+    if mode == "new_group":
+        conditions.append("""AND EXISTS (
+            SELECT 1 FROM `tabClefinCode Chat Profile Contact Details` AS ChatDetails
+            WHERE ChatDetails.parent = ChatProfile.name
+              AND ChatDetails.type = 'Chat'
+              AND ChatDetails.contact_info <> %(user_email)s)""")
+
+    query = (query or "").strip()
+    name_search = bool(query) and not NUMBER_QUERY.match(query)     # never matches unnamed profiles
+    if query:
+        if not name_search:
+            values["prefix"] = _like_prefix(re.sub(r"[\s-]", "", query))
+            conditions.append("""AND EXISTS (
+                SELECT 1 FROM `tabClefinCode Chat Profile Contact Details` AS SearchDetails
+                WHERE SearchDetails.parent = ChatProfile.name
+                  AND SearchDetails.contact_info LIKE %(prefix)s)""")
+        else:
+            values["prefix"] = _like_prefix(query)
+            conditions.append("AND ChatProfile.full_name LIKE %(prefix)s")
+
+    # Two phases so both can walk the (full_name, name) index on raw columns:
+    # named profiles by (full_name, name), then profiles without a name by name.
+    phase, after_name, after_id = frappe.parse_json(cursor) if cursor else ("named", None, None)
+    contacts_list = []
+    if phase == "named":
+        contacts_list = _search_page(conditions, values, "named", after_name, after_id, limit + 1)
+        if len(contacts_list) <= limit and not name_search:
+            contacts_list += _search_page(conditions, values, "unnamed", None, None, limit + 1 - len(contacts_list))
+    else:
+        contacts_list = _search_page(conditions, values, "unnamed", None, after_id, limit + 1)
+
+    next_cursor = None
+    if len(contacts_list) > limit:
+        contacts_list = contacts_list[:limit]
+        last = contacts_list[-1]
+        next_phase = "named" if last.full_name is not None else "unnamed"
+        next_cursor = frappe.as_json([next_phase, last.full_name, last.profile_id], indent=None)
+
+    attach_contact_details(contacts_list, contact_type="Chat" if mode == "new_group" else None)
+
+    return {"results": [{
+        "contacts": contacts_list,
+        "next_cursor": next_cursor,
+        "full": True,
+        "generated_at": now(),
+    }]}
+
+def _search_page(conditions, values, phase, after_name, after_id, limit):
+    conditions = list(conditions)
+    values = dict(values, limit=limit, after_name=after_name, after_id=after_id)
+    if phase == "named":
+        conditions.append("AND ChatProfile.full_name IS NOT NULL")
+        if after_id is not None:
+            conditions.append("""AND (ChatProfile.full_name > %(after_name)s
+                 OR (ChatProfile.full_name = %(after_name)s AND ChatProfile.name > %(after_id)s))""")
+        order_by = "ChatProfile.full_name, ChatProfile.name"
+    else:
+        conditions.append("AND ChatProfile.full_name IS NULL")
+        if after_id is not None:
+            conditions.append("AND ChatProfile.name > %(after_id)s")
+        order_by = "ChatProfile.name"
+
+    return frappe.db.sql(f"""
+        SELECT ChatProfile.name AS profile_id,
+               ChatProfile.full_name,
+               Contact.user AS user_id,
+               User.enabled,
+               GREATEST(ChatProfile.modified, Contact.modified) AS modified
+        FROM `tabClefinCode Chat Profile` AS ChatProfile
+        INNER JOIN `tabContact` AS Contact ON Contact.name = ChatProfile.contact
+        LEFT OUTER JOIN `tabUser` AS User ON User.name = Contact.user
+        WHERE (User.enabled = 1 OR User.enabled IS NULL)
+          {" ".join(conditions)}
+        ORDER BY {order_by}
+        LIMIT %(limit)s
+    """, values, as_dict=True)
 
-    return {"results": [{"contacts": contacts_list}]}
+def _like_prefix(text):
+    """LIKE pattern matching values that start with `text` (wildcards escaped)."""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
@@ -0,0 +1,178 @@
+import functools
+from collections import defaultdict
+
+import frappe
+
+# ─────────────────────────────────────────────────────
+# Company <-> User membership index (Redis sets)
+#
+#   yana_efris:company_users:<company>  -> users with a Company User Permission for it
+#   yana_efris:user_companies:<user>    -> companies the user is permitted on
+#
+# Built from one User Permission scan on first use, then kept current by the
+# User Permission doc_events below (after commit). Shared by every override
+# that needs company-scoped visibility (chat contacts, ...).
+# ─────────────────────────────────────────────────────
+INDEX_PREFIX = "yana_efris:company_index:"
+COMPANY_USERS_KEY = INDEX_PREFIX + "company_users:"
+USER_COMPANIES_KEY = INDEX_PREFIX + "user_companies:"
+BUILT_KEY = INDEX_PREFIX + "built"
+KEYS_KEY = INDEX_PREFIX + "keys"        # every set key written, so a rebuild can drop them without KEYS
+INDEX_TTL = 24 * 60 * 60                # backstop: a set stored from pre-commit data can't outlive a day
+REBUILD_LOCK_KEY = "yana_efris:company_index_rebuild"
+REBUILD_LOCK_TTL = 60
+# Every materialized set carries this member, so "key missing" (never built,
+# evicted) can't be mistaken for "no companies" - missing keys are re-read
+# from User Permission instead.
+EMPTY = "\x00"
+
+
+def _decode(values):
+    return {v.decode() if isinstance(v, bytes) else v for v in values or ()}
+
+
+def ensure_company_index():
+    cache = frappe.cache()
+    if not cache.exists(BUILT_KEY):
+        rebuild_company_index()
+
+
+def rebuild_company_index():
+    """
+    Rebuild the whole index with a single User Permission scan and swap it in
+    with one MULTI, so readers never see it half built. Only one worker
+    rebuilds at a time; readers fall back to the database meanwhile.
+    """
+    cache = frappe.cache()
+    if not cache.set(cache.make_key(REBUILD_LOCK_KEY), 1, nx=True, ex=REBUILD_LOCK_TTL):
+        return None
+
+    try:
+        rows = frappe.get_all(
+            "User Permission",
+            filters={"allow": "Company"},
+            fields=["user", "for_value"],
+        )
+        sets = defaultdict(lambda: {EMPTY})
+        for row in rows:
+            sets[cache.make_key(COMPANY_USERS_KEY + row.for_value)].add(row.user)
+            sets[cache.make_key(USER_COMPANIES_KEY + row.user)].add(row.for_value)
+
+        stale = _decode(cache.smembers(KEYS_KEY))
+        pipe = cache.pipeline()
+        pipe.delete(cache.make_key(KEYS_KEY), *stale)
+        for key, members in sets.items():
+            pipe.sadd(key, *members)
+            pipe.expire(key, INDEX_TTL)
+        if sets:
+            pipe.sadd(cache.make_key(KEYS_KEY), *sets)
+        pipe.set(cache.make_key(BUILT_KEY), 1, ex=INDEX_TTL)
+        pipe.execute()
+    finally:
+        cache.delete(cache.make_key(REBUILD_LOCK_KEY))
+
+    return len(rows)
+
+
+def _store(key, members):
+    """Replace one index set (with the EMPTY marker) atomically."""
+    cache = frappe.cache()
+    key = cache.make_key(key)
+    pipe = cache.pipeline()
+    pipe.delete(key)
+    pipe.sadd(key, EMPTY, *members)
+    pipe.expire(key, INDEX_TTL)
+    pipe.sadd(cache.make_key(KEYS_KEY), key)
+    pipe.execute()
+
+
+def _load_user(user):
+    companies = set(
+        frappe.get_all("User Permission", filters={"user": user, "allow": "Company"}, pluck="for_value")
+    )
+    _store(USER_COMPANIES_KEY + user, companies)
+    return companies
+
+
+def _load_company(company):
+    users = set(
+        frappe.get_all("User Permission", filters={"allow": "Company", "for_value": company}, pluck="user")
+    )
+    _store(COMPANY_USERS_KEY + company, users)
+    return users
+
+
+def get_user_companies(user):
+    """Companies the user has a Company User Permission for (set)."""
+    ensure_company_index()
+    members = _decode(frappe.cache().smembers(USER_COMPANIES_KEY + user))
+    if not members:
+        return _load_user(user)
+    return members - {EMPTY}
+
+
+def get_company_users(companies):
+    """Users permitted on any of `companies` (set)."""
+    companies = list(companies or ())
+    if not companies:
+        return set()
+    ensure_company_index()
+    cache = frappe.cache()
+    pipe = cache.pipeline(transaction=False)
+    for company in companies:
+        pipe.smembers(cache.make_key(COMPANY_USERS_KEY + company))
+
+    users = set()
+    for company, members in zip(companies, pipe.execute(), strict=True):
+        members = _decode(members)
+        users |= (members - {EMPTY}) if members else _load_company(company)
+    return users
+
+
+def get_users_sharing_company(user):
+    """Users that share at least one company with `user` (includes `user` itself when it has any)."""
+    return get_company_users(get_user_companies(user))
+
+
+def shares_company(user, other_user):
+    return bool(get_user_companies(user) & get_user_companies(other_user))
+
+
+# ─────────────────────────────────────────────────────
+# doc_events (User Permission)
+# ─────────────────────────────────────────────────────
+def on_user_permission_change(doc, method=None):
+    """
+    Re-sync the index entries of the affected user(s) from the database once the
+    transaction commits - before that the rows aren't visible to other readers,
+    and a rollback must leave the index alone.
+    """
+    cache = frappe.cache()
+    if not cache.exists(BUILT_KEY):
+        return  # nothing materialized yet; first reader builds it
+
+    users = {doc.user}
+    before = doc.get_doc_before_save() if hasattr(doc, "get_doc_before_save") else None
+    if before and before.user != doc.user:
+        users.add(before.user)
+
+    allows = {doc.allow, before.allow if before else None}
+    if "Company" not in allows:
+        return
+
+    frappe.db.after_commit.add(functools.partial(_sync_users, users))
+
+
+def _sync_users(users):
+    for user in users:
+        _sync_user(user)
+
+
+def _sync_user(user):
+    """Rewrite the user's set; company sets it touches are dropped and re-read on next use."""
+    cache = frappe.cache()
+    before = _decode(cache.smembers(USER_COMPANIES_KEY + user)) - {EMPTY}
+    after = _load_user(user)
+    changed = before ^ after
+    if changed:
+        cache.delete(*[cache.make_key(COMPANY_USERS_KEY + company) for company in changed])
@@ -0,0 +1,138 @@
+"""
+Deferred monkey patches for uganda_compliance.
+
+Importing yana_efris must stay cheap (it runs in every web worker, background
+worker and bench command), so nothing from uganda_compliance, Crypto or our own
+EFRIS modules is imported here. Instead, a post-import hook applies each patch
+the moment its target module finishes loading - which always happens before
+the first EFRIS call - and the patched attributes are small proxies that import
+the real implementation on first use.
+"""
+import importlib
+import sys
+import threading
+
+_pending = {}  # module name -> [patch(module)]
+_lock = threading.RLock()
+_finder = None
+
+
+# ─────────────────────────────────────────────────────
+# Lazy proxies
+# ─────────────────────────────────────────────────────
+def lazy_function(path):
+    """Callable that imports `package.module.attr` on first call and forwards to it."""
+    module_name, attr = path.rsplit(".", 1)
+    target = None
+
+    def proxy(*args, **kwargs):
+        nonlocal target
+        if target is None:
+            target = getattr(importlib.import_module(module_name), attr)
+        return target(*args, **kwargs)
+
+    proxy.__name__ = attr
+    proxy.__qualname__ = attr
+    proxy.__doc__ = f"Lazy proxy for {path}"
+    return proxy
+
+
+# ─────────────────────────────────────────────────────
+# Post-import hook (plain classes - importlib.abc alone costs ~30ms to import)
+# ─────────────────────────────────────────────────────
+class _PatchingLoader:
+    def __init__(self, loader):
+        self.loader = loader
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        self.loader.exec_module(module)
+        _apply(module.__name__, module)
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+
+class _PostImportFinder:
+    def find_spec(self, fullname, path, target=None):
+        if fullname not in _pending:
+            return None
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _PatchingLoader(spec.loader)
+                return spec
+        return None
+
+
+def _apply(module_name, module):
+    with _lock:
+        patches = _pending.pop(module_name, [])
+    for patch in patches:
+        patch(module)
+
+
+def when_imported(module_name, patch):
+    """Run patch(module) right after `module_name` is imported (or now, if it already is)."""
+    global _finder
+    with _lock:
+        module = sys.modules.get(module_name)
+        if module is None:
+            _pending.setdefault(module_name, []).append(patch)
+            if _finder is None:
+                _finder = _PostImportFinder()
+                sys.meta_path.insert(0, _finder)
+            return
+    patch(module)
+
+
+# ─────────────────────────────────────────────────────
+# Patch definitions
+# ─────────────────────────────────────────────────────
+def _patch_einvoice_api(module):
+    # Override generate_irn (already working fine)
+    module.EInvoiceAPI.generate_irn = staticmethod(lazy_function("yana_efris.api.efris_api.generate_irn"))
+
+
+def _patch_encryption_utils(module):
+    # ✅ Replace decrypt AES on module location
+    module.decrypt_aes_ecb = lazy_function("yana_efris.api.efris_api.decrypt_aes_ecb")
+
+
+def _patch_efris_api(module):
+    from yana_efris.api.upload import compressing_encrypt, envelope_json
+
+    # ✅ ALSO replace the local reference used inside efris_api.py
+    module.decrypt_aes_ecb = lazy_function("yana_efris.api.efris_api.decrypt_aes_ecb")
+
+    # Compact JSON (orjson when available) for envelopes encoded before encryption;
+    # also sets dataDescription.zipCode when the content was gzipped (efris_upload_mode = "gzip")
+    module.json = envelope_json
+    encrypt = getattr(module, "encrypt_aes_ecb", None)
+    if callable(encrypt) and not getattr(encrypt, "__yana_compressing__", False):
+        module.encrypt_aes_ecb = compressing_encrypt(encrypt)
+
+    # Request log writes: sync (unchanged) or buffered + compressed (efris_request_log_mode = "async")
+    module.log_request_to_efris = lazy_function("yana_efris.api.request_log.log_request_to_efris")
+
+
+def _patch_einvoice_doctype(module):
+    # Override JSON methods (working fine)
+    module.EInvoice.get_einvoice_json = lazy_function("yana_efris.doctype.e_invoice.e_invoice.get_einvoice_json")
+    module.EInvoice.get_seller_details_json = lazy_function(
+        "yana_efris.doctype.e_invoice.e_invoice.get_seller_details_json"
+    )
+    # module.EInvoice.get_tax_details = lazy_function("yana_efris.doctype.e_invoice.e_invoice.get_tax_details")
+    # module.calculate_tax_by_category = lazy_function("yana_efris.doctype.e_invoice.e_invoice.calculate_tax_by_category")
+
+
+def install():
+    when_imported("uganda_compliance.efris.api_classes.e_invoice", _patch_einvoice_api)
+    when_imported("uganda_compliance.efris.api_classes.encryption_utils", _patch_encryption_utils)
+    when_imported("uganda_compliance.efris.api_classes.efris_api", _patch_efris_api)
+    when_imported("uganda_compliance.efris.doctype.e_invoice.e_invoice", _patch_einvoice_doctype)
@@ -0,0 +1,13 @@
+import frappe
+
+
+def execute():
+    """Indexes for chat_contacts.search_contacts: name prefix search / keyset order and number prefix search."""
+    for doctype, columns in (
+        ("ClefinCode Chat Profile", ["full_name", "name"]),
+        ("ClefinCode Chat Profile Contact Details", ["contact_info(64)"]),
+    ):
+        if not frappe.db.table_exists(doctype):
+            continue
+        if all(frappe.db.has_column(doctype, column.split("(")[0]) for column in columns):
+            frappe.db.add_index(doctype, columns)
@@ -0,0 +1,16 @@
+import frappe
+
+
+def execute():
+    """Indexes for the usual E Invoice Request Log lookups (per document / interface, by date) and retention purge."""
+    doctype = "E Invoice Request Log"
+    if not frappe.db.table_exists(doctype):
+        return
+
+    for columns in (
+        ["reference_document", "interface_code", "creation"],
+        ["reference_document", "creation"],
+        ["creation"],
+    ):
+        if all(frappe.db.has_column(doctype, column) for column in columns):
+            frappe.db.add_index(doctype, columns)
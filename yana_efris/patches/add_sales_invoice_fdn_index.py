@@ -0,0 +1,7 @@
+import frappe
+
+
+def execute():
+    """Index for reconciliation: Sales Invoices are looked up by FDN once per T106 page."""
+    if frappe.db.has_column("Sales Invoice", "efris_irn"):
+        frappe.db.add_index("Sales Invoice", ["efris_irn"])
@@ -1,21 +1,74 @@
 // exchange_rate_common.js
-window.fetch_and_set_exchange_rate_common = function (frm) {
-	if (frm.doc.currency && frm.doc.company) {
-		frappe.call({
-			method: "yana_efris.api.efris_api.get_exchange_rate",
-			args: {
-				currency: frm.doc.currency,
-				company_name: frm.doc.company,
-			},
-			callback: function (r) {
-				if (!r.message) return;
-
-				let rate = parseFloat(r.message.rate) || null;
-				if (rate) {
-					frm.set_value("conversion_rate", rate);
-					rate !== 1 && frappe.msgprint(`Exchange Rate from EFRIS: ${rate}`);
-				}
-			},
+(function () {
+	// Client-side EFRIS rate cache shared by Quotation, Sales Order, Sales Invoice,
+	// Purchase Order and Purchase Invoice forms.
+	//   - rates are cached per (currency, company, date) for the page session
+	//   - concurrent requests for the same key share one in-flight promise
+	//   - misses within DEBOUNCE_MS are sent as one get_exchange_rates call per company
+	const DEBOUNCE_MS = 300;
+	const rate_cache = {}; // key -> rate
+	const in_flight = {}; // key -> Promise<rate>
+	const pending = {}; // company -> { currency: {resolve, reject} }
+	let flush_timer = null;
+
+	function cache_key(currency, company) {
+		return [currency, company, frappe.datetime.get_today()].join("|");
+	}
+
+	function flush_pending() {
+		flush_timer = null;
+		Object.keys(pending).forEach((company) => {
+			const waiters = pending[company];
+			delete pending[company];
+
+			frappe
+				.xcall("yana_efris.api.efris_api.get_exchange_rates", {
+					currencies: Object.keys(waiters),
+					company_name: company,
+				})
+				.then((rates) => {
+					Object.keys(waiters).forEach((currency) => {
+						const rate = parseFloat((rates || {})[currency]) || null;
+						if (rate) rate_cache[cache_key(currency, company)] = rate;
+						waiters[currency].resolve(rate);
+					});
+				})
+				.catch((err) => {
+					Object.values(waiters).forEach((w) => w.reject(err));
+				});
 		});
 	}
-};
+
+	window.get_exchange_rate_common = function (currency, company) {
+		const key = cache_key(currency, company);
+		if (key in rate_cache) return Promise.resolve(rate_cache[key]);
+		if (in_flight[key]) return in_flight[key];
+
+		in_flight[key] = new Promise((resolve, reject) => {
+			pending[company] = pending[company] || {};
+			pending[company][currency] = { resolve, reject };
+			clearTimeout(flush_timer);
+			flush_timer = setTimeout(flush_pending, DEBOUNCE_MS);
+		}).finally(() => {
+			delete in_flight[key];
+		});
+		return in_flight[key];
+	};
+
+	window.fetch_and_set_exchange_rate_common = function (frm) {
+		const currency = frm.doc.currency;
+		const company = frm.doc.company;
+		if (!currency || !company) return;
+
+		get_exchange_rate_common(currency, company)
+			.then((rate) => {
+				// form may have moved on while we waited
+				if (!rate || frm.doc.currency !== currency || frm.doc.company !== company) return;
+				if (flt(frm.doc.conversion_rate) === rate) return;
+
+				frm.set_value("conversion_rate", rate);
+				rate !== 1 && frappe.msgprint(`Exchange Rate from EFRIS: ${rate}`);
+			})
+			.catch((err) => console.error("[YANA EFRIS] exchange rate fetch failed", err));
+	};
+})();
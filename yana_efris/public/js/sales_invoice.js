@@ -18,6 +18,21 @@
 	};
 })();
 frappe.ui.form.on("Sales Invoice", {
+	onload: function (frm) {
+		// the credit note poller (yana_efris.api.credit_note_poller) resolves pending returns in the background
+		if (frm.doc.is_return && !frm.__efris_credit_note_listener) {
+			frm.__efris_credit_note_listener = true;
+			frappe.realtime.on("efris_credit_note_status", (data) => {
+				if (data && data.sales_invoice === frm.doc.name && cur_frm === frm) {
+					frappe.show_alert({
+						message: __("EFRIS credit note status: {0}", [data.status]),
+						indicator: "green",
+					});
+					frm.reload_doc();
+				}
+			});
+		}
+	},
 	refresh: async function (frm) {
 		console.log("This console is working");
 
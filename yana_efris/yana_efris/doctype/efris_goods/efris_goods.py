@@ -0,0 +1,138 @@
+# Copyright (c) 2026, YanaERP and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import cint, now_datetime
+
+# EFRIS record key -> EFRIS Goods field
+FIELD_MAP = {
+    "goodsName": "goods_name",
+    "taxRate": "tax_rate",
+    "unitPrice": "unit_price",
+    "currency": "currency",
+    "measureUnit": "measure_unit",
+    "goodsCategoryId": "goods_category_id",
+    "goodsCategoryName": "goods_category_name",
+}
+
+
+class EFRISGoods(Document):
+    pass
+
+
+def on_doctype_update():
+    # one row per (company, goodsCode) - also the O(1) lookup path
+    frappe.db.add_unique("EFRIS Goods", ["company", "goods_code"], constraint_name="unique_company_goods_code")
+
+
+# ─────────────────────────────────────────────────────
+# Mirror maintenance (called from the T127 fetch)
+# ─────────────────────────────────────────────────────
+def upsert_goods(company, records):
+    """Insert/update EFRIS Goods rows for a page of T127 records with one lookup query."""
+    rows = {}
+    for rec in records or []:
+        code = (rec.get("goodsCode") or "").strip()
+        if code:
+            rows[code] = {field: str(rec.get(key) or "").strip() for key, field in FIELD_MAP.items()}
+    if not rows:
+        return 0
+
+    existing = {
+        row.goods_code: row
+        for row in frappe.get_all(
+            "EFRIS Goods",
+            filters={"company": company, "goods_code": ["in", list(rows)]},
+            fields=["name", "goods_code", *FIELD_MAP.values()],
+        )
+    }
+    items = set(frappe.get_all("Item", filters={"name": ["in", list(rows)]}, pluck="name"))
+    now = now_datetime()
+
+    new_rows = []
+    for code, values in rows.items():
+        current = existing.get(code)
+        if current is None:
+            new_rows.append((
+                frappe.generate_hash(length=10), now, now, frappe.session.user, frappe.session.user,
+                company, code, code if code in items else None, now, *values.values(),
+            ))
+        elif any((current.get(field) or "") != value for field, value in values.items()):
+            frappe.db.set_value("EFRIS Goods", current.name, {**values, "last_synced_on": now}, update_modified=False)
+
+    if new_rows:
+        frappe.db.bulk_insert(
+            "EFRIS Goods",
+            fields=[
+                "name", "creation", "modified", "owner", "modified_by",
+                "company", "goods_code", "item", "last_synced_on", *FIELD_MAP.values(),
+            ],
+            values=new_rows,
+            ignore_duplicates=True,
+        )
+    return len(new_rows)
+
+
+# ─────────────────────────────────────────────────────
+# Lookup API
+# ─────────────────────────────────────────────────────
+def get_efris_goods(company, goods_code):
+    """Mirror row for (company, goods_code) or None - single indexed lookup."""
+    return frappe.db.get_value(
+        "EFRIS Goods",
+        {"company": company, "goods_code": goods_code},
+        ["name", "goods_code", "item", *FIELD_MAP.values()],
+        as_dict=True,
+    )
+
+
+def is_registered_in_efris(company, goods_code):
+    return bool(frappe.db.exists("EFRIS Goods", {"company": company, "goods_code": goods_code}))
+
+
+def get_registered_goods_codes(company, goods_codes):
+    """Subset of `goods_codes` registered for `company` (one IN query, for invoice/batch checks)."""
+    goods_codes = [c for c in set(goods_codes or []) if c]
+    if not goods_codes:
+        return set()
+    return set(
+        frappe.get_all(
+            "EFRIS Goods",
+            filters={"company": company, "goods_code": ["in", goods_codes]},
+            pluck="goods_code",
+        )
+    )
+
+
+@frappe.whitelist()
+def lookup_efris_goods(company, goods_code=None, search=None, limit=20):
+    """Exact goods code lookup, or a goods code / name prefix search over the local mirror."""
+    if goods_code:
+        return get_efris_goods(company, goods_code)
+
+    search = (search or "").strip()
+    or_filters = None
+    if search:
+        or_filters = {"goods_code": ["like", f"{search}%"], "goods_name": ["like", f"{search}%"]}
+    return frappe.get_all(
+        "EFRIS Goods",
+        filters={"company": company},
+        or_filters=or_filters,
+        fields=["goods_code", "goods_name", "tax_rate", "unit_price", "item"],
+        order_by="goods_name asc",
+        limit_page_length=cint(limit) or 20,
+    )
+
+
+def validate_item_registration(doc, method=None):
+    """Item validate hook: warn (don't block) when an EFRIS item isn't in the company's goods mirror."""
+    company = doc.get("efris_e_company")
+    if not company or doc.is_new():
+        return
+    if not is_registered_in_efris(company, doc.item_code):
+        frappe.msgprint(
+            f"Item {doc.item_code} is not registered in EFRIS for {company} (local goods mirror).",
+            indicator="orange",
+            alert=True,
+        )
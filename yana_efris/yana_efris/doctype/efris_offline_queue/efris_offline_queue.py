@@ -0,0 +1,14 @@
+# Copyright (c) 2026, YanaERP and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class EFRISOfflineQueue(Document):
+    pass
+
+
+def on_doctype_update():
+    # replay worker drains per company in creation order
+    frappe.db.add_index("EFRIS Offline Queue", ["company", "status", "creation"])
@@ -0,0 +1,16 @@
+# Copyright (c) 2026, YanaERP and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class EFRISRequestLog(Document):
+    pass
+
+
+def on_doctype_update():
+    # usual lookups: "all calls for this invoice", "all T109s in a period", retention purge
+    frappe.db.add_index("EFRIS Request Log", ["reference_document", "interface_code", "creation"])
+    frappe.db.add_index("EFRIS Request Log", ["interface_code", "creation"])
+    frappe.db.add_index("EFRIS Request Log", ["creation"])
@@ -0,0 +1,14 @@
+# Copyright (c) 2026, YanaERP and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class EFRISStockMovement(Document):
+    pass
+
+
+def on_doctype_update():
+    # flush job picks pending lines per company in creation order
+    frappe.db.add_index("EFRIS Stock Movement", ["company", "status", "creation"])